@@ -0,0 +1,89 @@
+# ============================================================
+# APPROXIMATE NEAREST-NEIGHBOUR BENCHMARK
+# ============================================================
+# Usage: python benchmarks/bench_ann.py [--n 1000000] [--dim 384] [--nprobe 8 16 32]
+# Builds exact and IVF retrieval backends over a synthetic clustered corpus and
+# reports build time, index memory, p50/p99 query latency and recall@k.
+
+import argparse
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from retrieval import ExactSearchBackend, IVFBackend, recall_at_k
+
+
+def synthetic_embeddings(n, dim, topics, seed=0, block_size=100000):
+    # Chunks cluster around topics, like sections of many courses
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dim)).astype(np.float32)
+    matrix = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, block_size):
+        size = min(block_size, n - start)
+        block = centres[rng.integers(0, topics, size)] + 0.6 * rng.standard_normal((size, dim), dtype=np.float32)
+        matrix[start:start + size] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return matrix, centres
+
+
+def latencies_ms(backend, queries, top_k, **kwargs):
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        backend.search(query, -1.0, top_k=top_k, **kwargs)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.percentile(times, 50), np.percentile(times, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark exact vs IVF retrieval")
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    args = parser.parse_args()
+
+    matrix, centres = synthetic_embeddings(args.n, args.dim, args.topics)
+    rng = np.random.default_rng(1)
+    queries = centres[rng.integers(0, args.topics, args.queries)] + 0.8 * rng.standard_normal(
+        (args.queries, args.dim), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    print(f"Corpus: {args.n:,} x {args.dim} float32 ({matrix.nbytes / 2**20:,.0f} MiB)\n")
+
+    exact = ExactSearchBackend(matrix)
+    p50, p99 = latencies_ms(exact, queries, args.k)
+    print(f"exact      p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   recall@{args.k} 1.000")
+
+    start = time.perf_counter()
+    ivf = IVFBackend.build(matrix)
+    build_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        ivf.save(index_dir)
+        disk_mib = sum(f.stat().st_size for f in Path(index_dir).iterdir()) / 2**20
+        del ivf
+        start = time.perf_counter()
+        ivf = IVFBackend.load(index_dir)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        print(f"\nIVF build: {build_seconds:.1f}s, {len(ivf.centroids)} lists, "
+              f"{disk_mib:,.0f} MiB on disk, memory-mapped load {load_ms:.1f} ms")
+        for nprobe in args.nprobe:
+            p50, p99 = latencies_ms(ivf, queries, args.k, nprobe=nprobe)
+            ivf.nprobe = nprobe
+            recall = recall_at_k(ivf, exact, queries, args.k)
+            print(f"ivf/{nprobe:<5} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   recall@{args.k} {recall:.3f}")
+        del ivf
+
+    print(f"\nPeak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
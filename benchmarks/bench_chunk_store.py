@@ -0,0 +1,113 @@
+# ============================================================
+# CHUNK STORE MEMORY AND PER-QUERY ALLOCATIONS
+# ============================================================
+# Usage: python benchmarks/bench_chunk_store.py [--repeats 200]
+# Compares the columnar ChunkStore against the list of chunk dicts it
+# replaced: resident bytes per chunk (chunk dicts each holding an embedding,
+# plus the normalised matrix, versus the store alone), and bytes allocated and
+# time per get_relevant_chunks call (result views versus a dict with a copy of
+# the text per result). Embeddings are random 384-dimensional vectors, the
+# size all-MiniLM-L6-v2 produces, so no model is needed.
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import config
+from txt_processor import load_lecture_texts, load_exercise_texts
+from processors import chunk_lectures_by_section, chunk_exercises_by_question
+from chunk_store import ChunkStore
+from semantic import build_embedding_matrix, get_relevant_chunks
+from references import build_reference_index
+from retrieval import ExactSearchBackend
+from bm25 import BM25Index
+
+QUESTIONS = [
+    "What is the expected value of perfect information?",
+    "How do I compute the Bayes factor?",
+    "Explain the difference between risk and uncertainty",
+    "What does a risk-averse utility function look like?",
+    "How is a decision tree rolled back?",
+]
+
+
+def allocated(build):
+    # Bytes still held by whatever build() returns
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, after - before
+
+
+def per_query(search, queries, repeats):
+    tracemalloc.start()
+    peak = 0
+    for question, embedding in queries:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        search(question, embedding)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for question, embedding in queries:
+            search(question, embedding)
+    return peak, (time.perf_counter() - start) / (repeats * len(queries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the columnar chunk store")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lecture_texts = load_lecture_texts(config.LECTURES_PATH)
+    exercise_texts = load_exercise_texts(config.EXERCISES_PATH)
+
+    def build_dicts():
+        dicts = chunk_lectures_by_section(lecture_texts) + chunk_exercises_by_question(exercise_texts)
+        for chunk in dicts:
+            chunk['embedding'] = rng.standard_normal(384).astype(np.float32)
+        return dicts, build_embedding_matrix(dicts)
+
+    build_dicts()  # imports and regex caches are not per-chunk memory
+    (dicts, matrix), dict_bytes = allocated(build_dicts)
+    store, store_bytes = allocated(lambda: ChunkStore.from_chunks(dicts))
+
+    backend = ExactSearchBackend(matrix)
+    lexical_index = BM25Index.build([chunk['text'] for chunk in dicts])
+    reference_index = build_reference_index(dicts)
+    queries = [(question, rng.standard_normal(384).astype(np.float32)) for question in QUESTIONS]
+
+    def search_views(question, embedding):
+        return get_relevant_chunks(question, store, similarity_threshold=0, retrieval_backend=backend,
+                                   question_embedding=embedding, reference_index=reference_index,
+                                   lexical_index=lexical_index, referenced_chunk_ids=set())
+
+    def search_dicts(question, embedding):
+        # What every query used to build: a fresh dict and text copy per result
+        return [chunk.to_dict() for chunk in search_views(question, embedding)]
+
+    view_bytes, view_us = per_query(search_views, queries, args.repeats)
+    dict_query_bytes, dict_us = per_query(search_dicts, queries, args.repeats)
+
+    n = len(dicts)
+    print(f"Corpus: {n} chunks, {len(QUESTIONS)} questions (similarity threshold 0, every chunk returned)\n")
+    print(f"{'':<14} {'bytes/chunk':>12} {'bytes/query':>12} {'us/query':>10}")
+    print(f"{'chunk dicts':<14} {dict_bytes / n:>12.0f} {dict_query_bytes:>12.0f} {dict_us:>10.1f}")
+    print(f"{'chunk store':<14} {store_bytes / n:>12.0f} {view_bytes:>12.0f} {view_us:>10.1f}")
+    print(f"\nResident memory {dict_bytes / store_bytes:.1f}x smaller, "
+          f"per-query allocations {dict_query_bytes / view_bytes:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# ============================================================
+# EMBEDDING THROUGHPUT BENCHMARK
+# ============================================================
+# Usage: python benchmarks/bench_embedding.py [--batch-sizes 1 8 32 64]
+# Embeds every lecture and exercise chunk on CPU and reports chunks/second.
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import torch
+import config
+from txt_processor import load_lecture_texts, load_exercise_texts
+from processors import chunk_lectures_by_section, chunk_exercises_by_question
+from semantic import get_embeddings
+
+
+def load_chunk_texts():
+    lecture_chunks = chunk_lectures_by_section(load_lecture_texts(config.LECTURES_PATH))
+    exercise_chunks = chunk_exercises_by_question(load_exercise_texts(config.EXERCISES_PATH))
+    return [chunk['text'] for chunk in lecture_chunks + exercise_chunks]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched chunk embedding")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    texts = load_chunk_texts()
+    print(f"Corpus: {len(texts)} chunks, device=cpu, threads={torch.get_num_threads()}\n")
+
+    # Warm up model loading so it is not charged to the first batch size
+    get_embeddings(texts[:2], batch_size=2)
+
+    print(f"{'batch':>6} {'seconds':>10} {'chunks/s':>10}")
+    for batch_size in args.batch_sizes:
+        best = float('inf')
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            get_embeddings(texts, batch_size=batch_size)
+            best = min(best, time.perf_counter() - start)
+        print(f"{batch_size:>6} {best:>10.2f} {len(texts) / best:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
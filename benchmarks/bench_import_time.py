@@ -0,0 +1,66 @@
+# ============================================================
+# STARTUP IMPORT-TIME PROFILE
+# ============================================================
+# Usage: python benchmarks/bench_import_time.py [--top 15] [--modules course_tutor ...]
+# Imports the modules app.py loads before the first page renders in a fresh
+# interpreter with -X importtime, prints the slowest imports and fails if a
+# heavy dependency that should load lazily is imported at startup.
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+# What app.py imports at the top, minus streamlit itself
+STARTUP_MODULES = ["course_tutor", "llm_handler", "models", "logger"]
+
+# Must only be imported on first use
+LAZY_MODULES = ["torch", "transformers", "sklearn", "scipy", "langchain_huggingface",
+                "langchain_text_splitters", "onnxruntime", "gspread"]
+
+
+def profile_imports(modules):
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        cwd=SRC_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    # Lines look like "import time:   self [us] | cumulative | package"
+    timings = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile startup import time")
+    parser.add_argument("--modules", nargs="+", default=STARTUP_MODULES)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = profile_imports(args.modules)
+    top_level = [t for t in timings if not t[0].startswith(" ")]
+    total_ms = sum(cumulative for _, _, cumulative in top_level) / 1000
+    print(f"Startup imports ({', '.join(args.modules)}): {total_ms:.0f} ms, {len(timings)} modules\n")
+
+    print(f"{'cumulative':>11} {'self':>9}  module")
+    for name, self_us, cumulative_us in sorted(timings, key=lambda t: t[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>9.1f}ms {self_us / 1000:>7.1f}ms  {name}")
+
+    loaded = {name.strip().split(".")[0] for name, _, _ in timings}
+    eager = [module for module in LAZY_MODULES if module in loaded]
+    if eager:
+        print(f"\n⚠️ Imported at startup but should be lazy: {', '.join(eager)}")
+        sys.exit(1)
+    print(f"\n✓ No heavy dependencies imported at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# ============================================================
+# PARALLEL INGESTION PIPELINE
+# ============================================================
+# Usage: python benchmarks/bench_ingestion.py [--copies 20] [--workers 4]
+# Copies the lecture and exercise files --copies times into a temporary
+# corpus, then chunks it with chunk_lectures_by_section /
+# chunk_exercises_by_question (everything loaded up front) and with the
+# streaming iter_document_chunks pipeline. Checks both produce the same
+# chunks and reports wall time and peak traced memory of each. Embedding is
+# left out so no model is needed.
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import config
+from txt_processor import load_lecture_texts, load_exercise_texts
+from processors import chunk_lectures_by_section, chunk_exercises_by_question, get_splitter
+from ingestion import iter_document_chunks
+
+
+def build_corpus(root, copies):
+    documents = []
+    for kind, source in (('lecture', config.LECTURES_PATH), ('exercise', config.EXERCISES_PATH)):
+        directory = root / kind
+        directory.mkdir()
+        for copy in range(copies):
+            for txt_file in sorted(Path(source).glob('*.txt')):
+                target = directory / f"{copy:03d} {txt_file.name}"
+                shutil.copyfile(txt_file, target)
+                documents.append((kind, target))
+    return documents
+
+
+def measure(function):
+    # Timed untraced, since tracemalloc slows the in-process side only
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    value = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return value, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parallel ingestion pipeline")
+    parser.add_argument("--copies", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        documents = build_corpus(root, args.copies)
+
+        def serial():
+            lecture_texts = load_lecture_texts(root / 'lecture')
+            exercise_texts = load_exercise_texts(root / 'exercise')
+            chunks = chunk_lectures_by_section(lecture_texts) + chunk_exercises_by_question(exercise_texts)
+            return [(chunk['document_name'], chunk) for chunk in chunks]
+
+        def streaming():
+            # A consumer that keeps only a count, as an embed-and-store stage would
+            count = 0
+            for _, _, _, chunks in iter_document_chunks(documents, workers=args.workers):
+                count += len(chunks)
+            return count
+
+        def streaming_chunks():
+            return [(name, chunk) for _, name, _, chunks in iter_document_chunks(documents, workers=args.workers)
+                    for chunk in chunks]
+
+        # Warm the splitter import so neither side pays it
+        get_splitter(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
+        serial_chunks, serial_seconds, serial_peak = measure(serial)
+        count, stream_seconds, stream_peak = measure(streaming)
+        identical = streaming_chunks() == serial_chunks
+
+    workers = args.workers or config.INGESTION_WORKERS or os.cpu_count()
+    print(f"Corpus: {len(documents)} documents, {len(serial_chunks)} chunks, {workers} workers "
+          f"({'identical' if identical and count == len(serial_chunks) else 'DIFFERENT'} output)\n")
+    print(f"{'':<22} {'seconds':>8} {'peak MiB':>9}")
+    print(f"{'load all, then chunk':<22} {serial_seconds:>8.2f} {serial_peak / 2**20:>9.1f}")
+    print(f"{'streaming pipeline':<22} {stream_seconds:>8.2f} {stream_peak / 2**20:>9.1f}")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
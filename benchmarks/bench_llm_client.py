@@ -0,0 +1,53 @@
+# ============================================================
+# LLM CLIENT REUSE BENCHMARK
+# ============================================================
+# Usage: python benchmarks/bench_llm_client.py [--requests 50] [--threads 8]
+# Sends questions through llm_handler against the local stub endpoint and
+# reports how many TCP connections were opened for how many requests.
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from stub_llm import start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check LLM client pooling against a stub endpoint")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--failures", type=int, default=2, help="Leading 503 replies to exercise retries")
+    args = parser.parse_args()
+
+    server = start_stub_server(failures=args.failures)
+    os.environ["HF_ENDPOINT_URL"] = server.url
+    os.environ.setdefault("HUGGINGFACE_API_KEY", "stub")
+
+    import config
+    config.LLM_RETRY_BACKOFF = 0.01
+    import llm_handler
+
+    first = llm_handler.get_llm()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        clients = list(pool.map(lambda _: llm_handler.get_llm(), range(args.threads)))
+    print(f"Shared client across {args.threads} threads: {all(c is first for c in clients)}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        answers = list(pool.map(lambda i: llm_handler.invoke_llm(f"Question {i}"), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    stats = server.stats.snapshot()
+    print(f"Answered:    {len(answers)} questions in {elapsed:.2f}s")
+    print(f"HTTP calls:  {stats['requests']} (including {args.failures} retried failures)")
+    print(f"Connections: {stats['connections']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
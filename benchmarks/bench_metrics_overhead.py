@@ -0,0 +1,106 @@
+# ============================================================
+# METRICS INSTRUMENTATION OVERHEAD
+# ============================================================
+# Usage: python benchmarks/bench_metrics_overhead.py [--rounds 5] [--max-overhead 1.0]
+# Times the cost of a single span and counter, then classifies a question set
+# with metrics enabled and disabled (interleaved rounds). The gate uses the
+# estimated overhead (recordings per question x cost per recording, relative
+# to the uninstrumented time), which unlike the end-to-end difference is not
+# swamped by run-to-run noise. Exits non-zero above --max-overhead percent.
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import metrics
+from course_tutor import CourseTutor
+
+QUESTIONS = [
+    "What is the expected value of perfect information?",
+    "How do I compute the Bayes factor?",
+    "Explain the difference between risk and uncertainty",
+    "For example 3 in week 7, why can we assume the prior probability equals to 0.03?",
+    "What does a risk-averse utility function look like?",
+    "When is the final exam?",
+    "How is a decision tree rolled back?",
+    "lecture 8 example 3",
+]
+
+
+def per_call_ns(function, repeats=200000):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1e9
+
+
+def classify_all(tutor, questions):
+    start = time.perf_counter()
+    for question in questions:
+        tutor.classify_question(question)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure metrics overhead on the question pipeline")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--repeat-questions", type=int, default=25)
+    parser.add_argument("--max-overhead", type=float, default=1.0, help="Percent")
+    args = parser.parse_args()
+
+    registry = metrics.MetricsRegistry(enabled=True)
+
+    def one_span():
+        with registry.span("bench.span"):
+            pass
+
+    span_ns = per_call_ns(one_span)
+    counter_ns = per_call_ns(lambda: registry.increment('bench', outcome='x'))
+    print(f"span:      {span_ns:7.0f} ns")
+    print(f"counter:   {counter_ns:7.0f} ns")
+    registry.enabled = False
+    print(f"disabled:  {per_call_ns(one_span):7.0f} ns\n")
+
+    tutor = CourseTutor()
+    questions = QUESTIONS * args.repeat_questions
+    classify_all(tutor, questions[:len(QUESTIONS)])
+    metrics.REGISTRY.reset()
+
+    # Interleave so drift (thermal, caches) hits both settings equally
+    timings = {True: [], False: []}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            metrics.REGISTRY.enabled = enabled
+            timings[enabled].append(classify_all(tutor, questions))
+    metrics.REGISTRY.enabled = True
+
+    off, on = min(timings[False]), min(timings[True])
+    measured = (on - off) / off * 100
+    print(f"{len(questions)} questions: metrics off {off / len(questions) * 1000:.3f} ms/question, "
+          f"on {on / len(questions) * 1000:.3f} ms/question ({measured:+.2f}% measured)")
+
+    answered = args.rounds * len(questions)
+    spans = sum(h.count for h in metrics.REGISTRY.histograms.values()) / answered
+    counters = sum(metrics.REGISTRY.counters.values()) / answered
+    overhead = (spans * span_ns + counters * counter_ns) / 1e9 / (off / len(questions)) * 100
+    print(f"{spans:.1f} spans and {counters:.1f} counters per question: {overhead:.3f}% estimated overhead")
+
+    summary = metrics.JsonSink().export()['histograms']
+    for name in ('classify.prefilter', 'classify.keywords', 'classify.references',
+                 'classify.embedding', 'classify.retrieval', 'classify.total'):
+        if name in summary:
+            s = summary[name]
+            print(f"  {name:<22} p50 {s['p50'] * 1000:8.3f} ms  p95 {s['p95'] * 1000:8.3f} ms  "
+                  f"p99 {s['p99'] * 1000:8.3f} ms")
+
+    if overhead > args.max_overhead:
+        print(f"\n⚠️ Overhead above {args.max_overhead}%")
+        sys.exit(1)
+    print(f"\n✓ Overhead within {args.max_overhead}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# ============================================================
+# EMBEDDING ENGINE PARITY AND LATENCY
+# ============================================================
+# Usage: python benchmarks/bench_onnx_embedding.py [--engines torch onnx] [--min-cosine 0.99]
+# Embeds every chunk with each engine in its own process, then reports
+# cosine agreement against the first engine, single-query latency, corpus
+# throughput and peak memory. Exits non-zero if agreement is below --min-cosine.
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import config
+from txt_processor import load_lecture_texts, load_exercise_texts
+from processors import chunk_lectures_by_section, chunk_exercises_by_question
+
+QUERIES = [
+    "What is the expected value of perfect information?",
+    "How do I compute the Bayes factor?",
+    "Explain the difference between risk and uncertainty",
+    "lecture 8 example 3",
+]
+
+
+def load_chunk_texts():
+    lecture_chunks = chunk_lectures_by_section(load_lecture_texts(config.LECTURES_PATH))
+    exercise_chunks = chunk_exercises_by_question(load_exercise_texts(config.EXERCISES_PATH))
+    return [chunk['text'] for chunk in lecture_chunks + exercise_chunks]
+
+
+def run_engine(engine, output_file, repeats):
+    # Child process: measure one engine in isolation so peak RSS is its own
+    config.EMBEDDING_ENGINE = engine
+    from semantic import get_embeddings
+
+    start = time.perf_counter()
+    get_embeddings(QUERIES[:1])
+    load_seconds = time.perf_counter() - start
+
+    query_times = []
+    for _ in range(repeats):
+        for query in QUERIES:
+            start = time.perf_counter()
+            get_embeddings([query])
+            query_times.append((time.perf_counter() - start) * 1000)
+
+    texts = load_chunk_texts()
+    start = time.perf_counter()
+    embeddings = get_embeddings(texts)
+    corpus_seconds = time.perf_counter() - start
+    np.save(output_file, embeddings)
+
+    print(json.dumps({
+        'load_seconds': load_seconds,
+        'query_p50_ms': float(np.percentile(query_times, 50)),
+        'query_p99_ms': float(np.percentile(query_times, 99)),
+        'chunks_per_second': len(texts) / corpus_seconds,
+        'peak_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def row_cosines(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding engines")
+    parser.add_argument("--engines", nargs="+", default=["torch", "onnx"])
+    parser.add_argument("--repeats", type=int, default=25)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_engine(args.child, args.output, args.repeats)
+        return
+
+    results, embeddings = {}, {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for engine in args.engines:
+            output_file = Path(tmp_dir) / f"{engine}.npy"
+            completed = subprocess.run(
+                [sys.executable, __file__, "--child", engine, "--output", str(output_file),
+                 "--repeats", str(args.repeats)],
+                capture_output=True, text=True, check=True
+            )
+            results[engine] = json.loads(completed.stdout.strip().splitlines()[-1])
+            embeddings[engine] = np.load(output_file)
+
+    reference = args.engines[0]
+    print(f"{'engine':>8} {'load s':>8} {'query p50':>10} {'query p99':>10} {'chunks/s':>9} "
+          f"{'peak RSS':>9} {'min cos':>8} {'mean cos':>9}")
+    failed = False
+    for engine in args.engines:
+        r = results[engine]
+        cosines = row_cosines(embeddings[reference], embeddings[engine])
+        failed |= cosines.min() < args.min_cosine
+        print(f"{engine:>8} {r['load_seconds']:>8.2f} {r['query_p50_ms']:>8.2f}ms {r['query_p99_ms']:>8.2f}ms "
+              f"{r['chunks_per_second']:>9.1f} {r['peak_rss_mib']:>6.0f}MiB {cosines.min():>8.4f} {cosines.mean():>9.4f}")
+
+    if failed:
+        print(f"\n⚠️ Cosine agreement with {reference} below {args.min_cosine}")
+        sys.exit(1)
+    print(f"\n✓ All engines agree with {reference} (cosine >= {args.min_cosine})")
+
+
+if __name__ == "__main__":
+    main()
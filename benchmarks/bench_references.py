@@ -0,0 +1,72 @@
+# ============================================================
+# REFERENCE EXTRACTION / MATCHING MICROBENCHMARK
+# ============================================================
+# Usage: python benchmarks/bench_references.py [--repeats 200]
+# Times reference extraction and chunk matching over a fixed question set,
+# matching once against the prebuilt index and once with the index rebuilt
+# per question (the cost of scanning every chunk, as the old matcher did).
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import config
+from txt_processor import load_lecture_texts, load_exercise_texts
+from processors import chunk_lectures_by_section, chunk_exercises_by_question
+from references import extract_document_references, match_references_to_chunks, build_reference_index
+
+QUESTIONS = [
+    "For example 3 in week 7, why can we assume the prior probability equals to 0.03?",
+    "In lecture 2 example 1, how is the expected utility computed?",
+    "Can you explain exercise 3 question 2 part b?",
+    "What is the answer to ex 5 q1(a)?",
+    "How do lectures 3-4 define the Bayes factor?",
+    "What does week 1 and 2 say about Value-at-Risk?",
+    "Question 4 in exercise sheet 6, I don't understand the decision tree.",
+    "Explain lecture 8 to 9 again please",
+    "What is the difference between VaR and expected shortfall?",
+    "Why is the utility function concave for a risk-averse decision maker?",
+    "exercise 7 question 3",
+    "q2 part ii in exercise 8",
+    "How do I compute the posterior in example 2 of lecture 6?",
+    "What is a minimax regret strategy?",
+    "Summarise weeks 5 to 7",
+]
+
+
+def time_per_question(fn, questions, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for question in questions:
+            fn(question)
+    return (time.perf_counter() - start) / (repeats * len(questions)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reference extraction and matching")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    chunks = (chunk_lectures_by_section(load_lecture_texts(config.LECTURES_PATH)) +
+              chunk_exercises_by_question(load_exercise_texts(config.EXERCISES_PATH)))
+    index = build_reference_index(chunks)
+    references = {question: extract_document_references(question) for question in QUESTIONS}
+
+    extract_us = time_per_question(extract_document_references, QUESTIONS, args.repeats)
+    indexed_us = time_per_question(
+        lambda q: match_references_to_chunks(references[q], chunks, index), QUESTIONS, args.repeats)
+    scan_us = time_per_question(
+        lambda q: match_references_to_chunks(references[q], chunks), QUESTIONS, max(args.repeats // 10, 1))
+
+    print(f"Corpus: {len(chunks)} chunks, {len(QUESTIONS)} questions\n")
+    print(f"extract_document_references:      {extract_us:10.1f} us/question")
+    print(f"match (prebuilt index):           {indexed_us:10.1f} us/question")
+    print(f"match (per-question chunk scan):  {scan_us:10.1f} us/question")
+    print(f"speedup:                          {scan_us / indexed_us:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
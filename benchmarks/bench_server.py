@@ -0,0 +1,156 @@
+# ============================================================
+# HTTP SERVER LOAD TEST
+# ============================================================
+# Usage: python benchmarks/bench_server.py [--endpoint stream] [--requests 200] [--concurrency 32]
+# Starts the stub LLM and the ASGI server in-process, fires concurrent
+# questions at one endpoint and reports throughput, p50/p95/p99 latency,
+# time to first token (for /stream) and the mean embedding micro-batch size.
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_llm import start_stub_server
+
+QUESTIONS = [
+    "What is the expected value of perfect information?",
+    "How do I compute the Bayes factor?",
+    "Explain the difference between risk and uncertainty",
+    "For example 3 in week 7, why can we assume the prior probability equals to 0.03?",
+    "What does a risk-averse utility function look like?",
+    "How is a decision tree rolled back?",
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_tutor_server(port):
+    import uvicorn
+    import server
+
+    uv_server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=uv_server.run, daemon=True)
+    thread.start()
+    return uv_server, thread
+
+
+async def request(port, method, path, payload=None):
+    # Minimal HTTP/1.1 client: one connection per request, read until close.
+    # Returns (status, body, seconds until the first streamed token or None)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+
+    start = time.perf_counter()
+    first_token = None
+    received = bytearray()
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            break
+        received += data
+        if first_token is None and b'"token"' in received:
+            first_token = time.perf_counter() - start
+    writer.close()
+
+    head, _, content = bytes(received).partition(b"\r\n\r\n")
+    return int(head.split()[1]), content, first_token
+
+
+async def wait_until_ready(port, timeout=600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, body, _ = await request(port, "GET", "/health")
+            if status == 200 and json.loads(body)['status'] == 'ok':
+                return
+        except (OSError, ValueError):
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError("Server did not become ready")
+
+
+async def run_load(port, endpoint, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_tokens, errors = [], [], 0
+
+    async def one(i):
+        nonlocal errors
+        # Numbered questions keep the answer cache from serving repeats
+        question = f"{QUESTIONS[i % len(QUESTIONS)]} ({i})"
+        async with semaphore:
+            start = time.perf_counter()
+            status, _, first_token = await request(port, "POST", f"/{endpoint}", {'question': question})
+            latencies.append(time.perf_counter() - start)
+            if first_token is not None:
+                first_tokens.append(first_token)
+            errors += status != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    return time.perf_counter() - start, latencies, first_tokens, errors
+
+
+def percentiles_ms(values):
+    return "  ".join(f"p{p} {np.percentile(values, p) * 1000:7.1f}ms" for p in (50, 95, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the headless tutor server")
+    parser.add_argument("--endpoint", choices=["classify", "answer", "stream"], default="stream")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="Stub LLM seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    stub = start_stub_server(delay=args.llm_delay, token_delay=args.token_delay)
+    os.environ["HF_ENDPOINT_URL"] = stub.url
+    os.environ.setdefault("HUGGINGFACE_API_KEY", "stub")
+
+    port = free_port()
+    uv_server, thread = start_tutor_server(port)
+
+    async def session():
+        await wait_until_ready(port)
+        elapsed, latencies, first_tokens, errors = await run_load(port, args.endpoint, args.requests,
+                                                                  args.concurrency)
+        _, health, _ = await request(port, "GET", "/health")
+        return elapsed, latencies, first_tokens, errors, json.loads(health)
+
+    elapsed, latencies, first_tokens, errors, health = asyncio.run(session())
+
+    print(f"/{args.endpoint}: {args.requests} requests, concurrency {args.concurrency}, "
+          f"stub LLM {args.llm_delay * 1000:.0f}ms + {args.token_delay * 1000:.0f}ms/token\n")
+    print(f"Throughput:   {args.requests / elapsed:.1f} req/s ({errors} errors)")
+    print(f"Latency:      {percentiles_ms(latencies)}")
+    if first_tokens:
+        print(f"First token:  {percentiles_ms(first_tokens)}")
+    batches = health['embedding_batches']
+    print(f"Embedding:    {batches['texts']} questions in {batches['batches']} forward passes "
+          f"(mean batch {batches['mean_batch_size']:.1f})")
+
+    uv_server.should_exit = True
+    thread.join(10)
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
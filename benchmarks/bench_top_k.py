@@ -0,0 +1,85 @@
+# ============================================================
+# TOP-K RETRIEVAL SCALING
+# ============================================================
+# Usage: python benchmarks/bench_top_k.py [--sizes 1000 10000 100000] [--repeats 20]
+# Replicates the course chunks into synthetic corpora of increasing size
+# (random 384-dimensional embeddings) and times get_relevant_chunks with
+# every chunk returned versus top_k=RETRIEVAL_TOP_K, dense-only and with
+# hybrid fusion. "scoring" is the matrix-vector product alone, the floor
+# for any exact search.
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import config
+from txt_processor import load_lecture_texts, load_exercise_texts
+from processors import chunk_lectures_by_section, chunk_exercises_by_question
+from chunk_store import ChunkStore
+from semantic import get_relevant_chunks
+from retrieval import ExactSearchBackend
+from bm25 import BM25Index
+
+QUESTIONS = [
+    "What is the expected value of perfect information?",
+    "How do I compute the Bayes factor?",
+    "Explain the difference between risk and uncertainty",
+    "What does a risk-averse utility function look like?",
+]
+
+
+def synthetic_corpus(chunks, size, rng):
+    replicated = [dict(chunks[i % len(chunks)], chunk_id=f"{chunks[i % len(chunks)]['chunk_id']}_{i}",
+                       embedding=rng.standard_normal(384).astype(np.float32)) for i in range(size)]
+    store = ChunkStore.from_chunks(replicated)
+    return store, ExactSearchBackend(store.embeddings), BM25Index.build(store.texts())
+
+
+def time_ms(function, queries, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for question, query in queries:
+            function(question, query)
+    return (time.perf_counter() - start) / (repeats * len(queries)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark top-k retrieval against returning every chunk")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    chunks = (chunk_lectures_by_section(load_lecture_texts(config.LECTURES_PATH)) +
+              chunk_exercises_by_question(load_exercise_texts(config.EXERCISES_PATH)))
+    queries = [(question, rng.standard_normal(384).astype(np.float32)) for question in QUESTIONS]
+    fusion = config.HYBRID_FUSION
+
+    print(f"{'chunks':>8} {'fusion':>7} {'scoring':>9} {'all ms':>9} {'top-k ms':>9} {'speedup':>8}")
+    for size in args.sizes:
+        store, backend, lexical_index = synthetic_corpus(chunks, size, rng)
+        scoring = time_ms(lambda question, query: store.embeddings @ query, queries, args.repeats)
+
+        for hybrid in (None, fusion):
+            config.HYBRID_FUSION = hybrid
+
+            def search(top_k):
+                return lambda question, query: get_relevant_chunks(
+                    question, store, similarity_threshold=0, retrieval_backend=backend,
+                    question_embedding=query, reference_index={}, lexical_index=lexical_index,
+                    referenced_chunk_ids=set(), top_k=top_k)
+
+            every = time_ms(search(None), queries, args.repeats)
+            top = time_ms(search(config.RETRIEVAL_TOP_K), queries, args.repeats)
+            print(f"{size:>8} {str(hybrid):>7} {scoring:>9.3f} {every:>9.3f} {top:>9.3f} "
+                  f"{every / top:>7.1f}x")
+    config.HYBRID_FUSION = fusion
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# ============================================================
+# LOCAL STUB LLM ENDPOINT
+# ============================================================
+# OpenAI-compatible /v1/chat/completions server used to exercise the LLM
+# client offline. Run standalone with:
+#   python benchmarks/stub_llm.py --port 8081
+# then point the app at it with HF_ENDPOINT_URL=http://127.0.0.1:8081
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "The expected utility is $E[U(X)] = \\sum_i p_i U(x_i)$, the probability-weighted average utility."
+
+
+class StubStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.failures_left = 0
+
+    def snapshot(self):
+        with self.lock:
+            return {'connections': self.connections, 'requests': self.requests}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open so client-side pooling is observable
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.stats.lock:
+            self.server.stats.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        with self.server.stats.lock:
+            self.server.stats.requests += 1
+            fail = self.server.stats.failures_left > 0
+            if fail:
+                self.server.stats.failures_left -= 1
+
+        if fail:
+            self._send_json(503, {'error': 'stub overloaded'})
+            return
+
+        time.sleep(self.server.delay)
+        if body.get('stream'):
+            self._send_stream()
+        else:
+            self._send_json(200, {
+                'id': 'stub',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': 'stub',
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': self.server.reply},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+            })
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        tokens = [token + " " for token in self.server.reply.split(" ")]
+        for i, token in enumerate(tokens):
+            event = {
+                'id': 'stub',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': 'stub',
+                'choices': [{
+                    'index': 0,
+                    'delta': {'role': 'assistant', 'content': token},
+                    'finish_reason': 'stop' if i == len(tokens) - 1 else None
+                }]
+            }
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+            time.sleep(self.server.token_delay)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_stub_server(port=0, delay=0.0, token_delay=0.0, reply=DEFAULT_REPLY, failures=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.stats = StubStats()
+    server.stats.failures_left = failures
+    server.delay = delay
+    server.token_delay = token_delay
+    server.reply = reply
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stub chat-completions endpoint")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds before each reply")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port, args.delay, args.token_delay)
+    print(f"Stub LLM listening on {server.url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(server.stats.snapshot())
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
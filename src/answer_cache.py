@@ -0,0 +1,148 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import config
+
+
+def normalize_question(question):
+    text = re.sub(r'\s+', ' ', question.lower()).strip()
+    return text.rstrip('?!. ')
+
+
+def _resolve_embedding(question_embedding):
+    return question_embedding() if callable(question_embedding) else question_embedding
+
+
+class AnswerCache:
+    def __init__(self, max_size=None, ttl=None, similarity_threshold=None):
+        self.max_size = max_size if max_size is not None else config.ANSWER_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else config.ANSWER_CACHE_TTL
+        self.similarity_threshold = (similarity_threshold if similarity_threshold is not None
+                                     else config.ANSWER_CACHE_SIMILARITY)
+        self.corpus_version = None
+
+        # (normalized question, retrieved chunk ids) -> entry, oldest first
+        self._entries = OrderedDict()
+        # retrieved chunk ids -> keys, so semantic lookups only compare grounded peers
+        self._by_chunks = {}
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def set_corpus_version(self, version):
+        # Cached answers are grounded in chunk text, so any corpus change drops them
+        with self._lock:
+            if version != self.corpus_version:
+                self._entries.clear()
+                self._by_chunks.clear()
+                self.corpus_version = version
+
+    def get(self, question, chunk_ids, question_embedding=None):
+        # question_embedding may be a callable; it is only called after an
+        # exact-text miss, when there are grounded peers to compare against
+        key = (normalize_question(question), tuple(chunk_ids))
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_expired(now)
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                self.saved_seconds += entry['latency']
+                return entry['answer']
+
+            if question_embedding is None or not self._has_embedded_peers(key[1]):
+                self.misses += 1
+                return None
+
+        # Embed outside the lock so other lookups are not held up
+        question_embedding = _resolve_embedding(question_embedding)
+
+        with self._lock:
+            match = self._find_similar(key[1], question_embedding)
+            if match is not None:
+                self._entries.move_to_end(match)
+                entry = self._entries[match]
+                self.semantic_hits += 1
+                self.saved_seconds += entry['latency']
+                return entry['answer']
+
+            self.misses += 1
+            return None
+
+    def put(self, question, chunk_ids, answer, latency, question_embedding=None):
+        key = (normalize_question(question), tuple(chunk_ids))
+        embedding = None
+        if question_embedding is not None:
+            embedding = np.asarray(_resolve_embedding(question_embedding), dtype=np.float32)
+            embedding = embedding / max(np.linalg.norm(embedding), 1e-12)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'answer': answer,
+                'embedding': embedding,
+                'latency': latency,
+                'created': time.monotonic()
+            }
+            self._by_chunks.setdefault(key[1], set()).add(key)
+
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_chunks.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'exact_hits': self.exact_hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+                'saved_seconds': self.saved_seconds
+            }
+
+    def _has_embedded_peers(self, chunk_ids):
+        return any(self._entries[key]['embedding'] is not None for key in self._by_chunks.get(chunk_ids, ()))
+
+    def _find_similar(self, chunk_ids, question_embedding):
+        keys = [key for key in self._by_chunks.get(chunk_ids, ())
+                if self._entries[key]['embedding'] is not None]
+        if not keys:
+            return None
+
+        query = np.asarray(question_embedding, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        similarities = np.vstack([self._entries[key]['embedding'] for key in keys]) @ query
+
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return keys[best]
+        return None
+
+    def _evict_expired(self, now):
+        # Entries are kept in recency order, not age order, so scan them all
+        expired = [key for key, entry in self._entries.items() if now - entry['created'] > self.ttl]
+        for key in expired:
+            self._remove(key)
+
+    def _remove(self, key):
+        del self._entries[key]
+        peers = self._by_chunks.get(key[1])
+        if peers is not None:
+            peers.discard(key)
+            if not peers:
+                del self._by_chunks[key[1]]
@@ -10,7 +10,9 @@ from course_tutor import CourseTutor
 from logger import SheetLogger
 import time
 from llm_handler import convert_latex_delimiters
-from classifier import classify_question_complete
+from models import warm_embedding_engine, embedding_engine_ready
+from metrics import JsonSink, export_on_exit
+import config
 
 # Page configuration
 st.set_page_config(
@@ -58,7 +60,9 @@ st.markdown("""
 # Initialize tutor
 @st.cache_resource
 def initialize_tutor():
-    return CourseTutor()
+    if config.METRICS_JSON_PATH:
+        export_on_exit(JsonSink(config.METRICS_JSON_PATH))
+    return CourseTutor(watch=True)
 
 
 # Initialize Google Sheets logger
@@ -73,9 +77,9 @@ def initialize_logger():
         logger = SheetLogger(sheet_id)
         if logger.worksheet:
             st.success("✅ Connected to Google Sheets")
-            return logger
         else:
-            return None
+            st.warning("⚠️ Logs are kept locally until Google Sheets is reachable")
+        return logger
     except Exception as e:
         st.warning(f"⚠️ Google Sheets connection failed: {e}")
         return None
@@ -88,6 +92,9 @@ def initialize_logger():
 st.title("📚 AI-Powered Course Tutor")
 st.markdown("Ask questions about the course and receive answers based on lecture notes and exercise sheets.")
 
+# Load the embedding model in the background while the corpus loads and the page renders
+warm_embedding_engine()
+
 # Initialize tutor and logger
 tutor = initialize_tutor()
 logger = initialize_logger()
@@ -106,6 +113,22 @@ with st.sidebar:
         value="Anonymous Student",
         help="Used for logging purposes"
     )
+    compare_without_context = st.checkbox(
+        "Compare with answer without course context",
+        value=False,
+        help="Also asks the model without lecture notes (makes a second LLM call)"
+    )
+
+    if embedding_engine_ready():
+        st.caption("🟢 Embedding model ready")
+    else:
+        st.caption("🟡 Loading embedding model... the first question may take a few seconds")
+
+    cache_stats = tutor.answer_cache.stats()
+    st.caption(
+        f"Answer cache: {cache_stats['hit_rate']:.0%} hit rate, "
+        f"{cache_stats['saved_seconds']:.0f}s of generation saved"
+    )
 
 with st.form("question_form"):
     question = st.text_area(
@@ -118,20 +141,9 @@ with st.form("question_form"):
 if submitted:
     if question.strip():
         with st.spinner("Processing question..."):
-            result = tutor.process_question(question)
-            
-            classification_result = classify_question_complete(
-                question,
-                tutor.master_keywords,
-                tutor.chunks_with_embeddings
-            )
-            confidence = classification_result['confidence']
-
-            response_with_context = result['response']
-            response_with_context = convert_latex_delimiters(response_with_context)
-
-            response_without_context = tutor.process_question_no_context(question)["response"]
-            response_without_context = convert_latex_delimiters(response_without_context)
+            # Classification only; the answer itself is streamed below
+            result = tutor.process_question(question, stream=True)
+            confidence = result['confidence']
 
         st.divider()
         
@@ -168,7 +180,18 @@ if submitted:
             
         else:
             st.subheader("Response")
-            st.markdown(response_with_context)
+            response_placeholder = st.empty()
+            response_with_context = ""
+            for token in result['response_stream']:
+                response_with_context += token
+                response_placeholder.markdown(response_with_context + "▌")
+            response_placeholder.markdown(response_with_context)
+
+            if compare_without_context:
+                with st.spinner("Generating answer without course context..."):
+                    response_without_context = tutor.process_question_no_context(question)['response']
+                with st.expander("Answer without course context"):
+                    st.markdown(convert_latex_delimiters(response_without_context))
             
             # Display confidence 
             if confidence >= 0.6:
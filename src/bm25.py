@@ -0,0 +1,68 @@
+from collections import Counter
+import numpy as np
+from processors import TOKEN_PATTERN, get_stop_words
+import config
+
+
+def tokenize(text):
+    stop_words = get_stop_words()
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in stop_words]
+
+
+class BM25Index:
+    # Inverted index in CSR form: postings for term t are
+    # doc_ids[indptr[t]:indptr[t + 1]] with precomputed BM25 weights, so a
+    # query is a handful of slice-and-add operations over float32 arrays.
+    def __init__(self, vocabulary, indptr, doc_ids, weights, num_documents):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.num_documents = num_documents
+
+    @classmethod
+    def build(cls, texts, k1=None, b=None):
+        k1 = config.BM25_K1 if k1 is None else k1
+        b = config.BM25_B if b is None else b
+
+        vocabulary = {}
+        term_ids, doc_ids, term_freqs = [], [], []
+        doc_lengths = []
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for term, freq in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                term_freqs.append(freq)
+
+        num_documents = len(doc_lengths)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        term_freqs = np.asarray(term_freqs, dtype=np.float32)
+        doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+
+        # Group postings by term
+        order = np.argsort(term_ids, kind='stable')
+        doc_ids, term_freqs = doc_ids[order], term_freqs[order]
+        document_freqs = np.bincount(term_ids, minlength=len(vocabulary))
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(document_freqs, out=indptr[1:])
+
+        # Okapi BM25 with the non-negative (Lucene) idf
+        idf = np.log1p((num_documents - document_freqs + 0.5) / (document_freqs + 0.5)).astype(np.float32)
+        average_length = max(float(doc_lengths.mean()), 1.0) if num_documents else 1.0
+        length_norm = k1 * (1 - b + b * doc_lengths[doc_ids] / average_length)
+        weights = np.repeat(idf, document_freqs) * term_freqs * (k1 + 1) / (term_freqs + length_norm)
+
+        return cls(vocabulary, indptr, doc_ids, weights.astype(np.float32), num_documents)
+
+    def scores(self, query):
+        scores = np.zeros(self.num_documents, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                start, end = self.indptr[term_id], self.indptr[term_id + 1]
+                # A document appears at most once per term, so fancy-index add is safe
+                scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
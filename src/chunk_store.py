@@ -0,0 +1,205 @@
+import numpy as np
+
+# ============================================================
+# COLUMNAR CHUNK STORE
+# ============================================================
+# Chunks are identified by their integer position. Every field lives in a
+# column: chunk texts are one UTF-8 buffer sliced by offsets, document names
+# and section titles are interned, and embeddings are a single row-normalised
+# (N, d) matrix. Indexing the store returns a ChunkView, which reads like the
+# chunk dicts produced by processors.py without holding a copy of anything.
+
+# Integer columns use -1 for "not set" (lectures have no question_num,
+# exercises no chunk_index)
+UNSET = -1
+
+
+class ChunkStore:
+    def __init__(self, chunk_ids, document_codes, documents, document_types, chunk_index, question_num,
+                 section_codes, sections, text_buffer, text_offsets, char_length, examples, parts, embeddings):
+        self.chunk_ids = chunk_ids
+        self.document_codes = document_codes
+        self.documents = documents
+        self.document_types = document_types
+        self.chunk_index = chunk_index
+        self.question_num = question_num
+        self.section_codes = section_codes
+        self.sections = sections
+        self.text_buffer = text_buffer
+        self.text_offsets = text_offsets
+        self.char_length = char_length
+        # Small per-chunk tuples, None when the chunk kind has no such field
+        self.examples = examples
+        self.parts = parts
+        self.embeddings = embeddings
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        documents, document_types, document_lookup = [], [], {}
+        sections, section_lookup = [], {}
+        n = len(chunks)
+        document_codes = np.empty(n, dtype=np.int32)
+        section_codes = np.empty(n, dtype=np.int32)
+        chunk_index = np.full(n, UNSET, dtype=np.int32)
+        question_num = np.full(n, UNSET, dtype=np.int32)
+        char_length = np.empty(n, dtype=np.int32)
+        text_offsets = np.zeros(n + 1, dtype=np.int64)
+        encoded, examples, parts = [], [], []
+
+        for i, chunk in enumerate(chunks):
+            name = chunk['document_name']
+            if name not in document_lookup:
+                document_lookup[name] = len(documents)
+                documents.append(name)
+                document_types.append(chunk['document_type'])
+            document_codes[i] = document_lookup[name]
+
+            title = chunk.get('section_title', '')
+            section_codes[i] = section_lookup.setdefault(title, len(sections))
+            if section_codes[i] == len(sections):
+                sections.append(title)
+
+            chunk_index[i] = chunk.get('chunk_index', UNSET)
+            question_num[i] = chunk.get('question_num', UNSET)
+            char_length[i] = chunk['char_length']
+
+            text = chunk['text'].encode('utf-8')
+            encoded.append(text)
+            text_offsets[i + 1] = text_offsets[i] + len(text)
+
+            examples.append(tuple(chunk['examples']) if chunk.get('examples') is not None else None)
+            parts.append(tuple(chunk['parts']) if chunk.get('parts') is not None else None)
+
+        embeddings = None
+        if n and all(chunk.get('embedding') is not None for chunk in chunks):
+            embeddings = np.vstack([chunk['embedding'] for chunk in chunks]).astype(np.float32)
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+        return cls([chunk['chunk_id'] for chunk in chunks], document_codes, documents, document_types,
+                   chunk_index, question_num, section_codes, sections, b''.join(encoded), text_offsets,
+                   char_length, examples, parts, embeddings)
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def __getitem__(self, position):
+        if not -len(self) <= position < len(self):
+            raise IndexError(position)
+        return ChunkView(self, position % len(self))
+
+    def __iter__(self):
+        return (ChunkView(self, position) for position in range(len(self)))
+
+    def text(self, position):
+        return self.text_buffer[self.text_offsets[position]:self.text_offsets[position + 1]].decode('utf-8')
+
+    def texts(self):
+        return [self.text(position) for position in range(len(self))]
+
+    def records(self, start=0, stop=None):
+        # Plain chunk dicts (without embeddings), e.g. to re-embed or re-index a range
+        return [self[position].to_dict() for position in range(start, len(self) if stop is None else stop)]
+
+
+# ============================================================
+# VIEWS
+# ============================================================
+
+class ChunkView:
+    # Read-only, dict-style access to one chunk of a store
+    __slots__ = ('store', 'position')
+
+    def __init__(self, store, position):
+        self.store = store
+        self.position = position
+
+    def _field(self, key):
+        store, i = self.store, self.position
+        if key == 'chunk_id':
+            return store.chunk_ids[i]
+        if key == 'document_name':
+            return store.documents[store.document_codes[i]]
+        if key == 'document_type':
+            return store.document_types[store.document_codes[i]]
+        if key == 'chunk_index' and store.chunk_index[i] != UNSET:
+            return int(store.chunk_index[i])
+        if key == 'question_num' and store.question_num[i] != UNSET:
+            return int(store.question_num[i])
+        if key == 'section_title':
+            return store.sections[store.section_codes[i]]
+        if key == 'text':
+            return store.text(i)
+        if key == 'char_length':
+            return int(store.char_length[i])
+        if key == 'examples' and store.examples[i] is not None:
+            return list(store.examples[i])
+        if key == 'parts' and store.parts[i] is not None:
+            return list(store.parts[i])
+        if key == 'embedding' and store.embeddings is not None:
+            return store.embeddings[i]
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        return self._field(key)
+
+    def get(self, key, default=None):
+        try:
+            return self._field(key)
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        return [key for key in CHUNK_FIELDS if key in self]
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys() if key != 'embedding'}
+
+
+CHUNK_FIELDS = ('chunk_id', 'document_name', 'document_type', 'chunk_index', 'question_num',
+                'section_title', 'text', 'char_length', 'examples', 'parts', 'embedding')
+
+
+class RetrievedChunk(ChunkView):
+    # One retrieval result: a chunk position plus its score
+    __slots__ = ('similarity_score', 'from_reference')
+
+    def __init__(self, store, position, similarity_score, from_reference):
+        super().__init__(store, position)
+        self.similarity_score = similarity_score
+        self.from_reference = from_reference
+
+    def _field(self, key):
+        if key == 'similarity_score':
+            return self.similarity_score
+        if key == 'from_reference':
+            return self.from_reference
+        if key == 'lecture':
+            return super()._field('document_name')
+        if key == 'chunk_index' and self.store.chunk_index[self.position] == UNSET:
+            return 0
+        return super()._field(key)
+
+    def keys(self):
+        return list(RESULT_FIELDS)
+
+    def to_dict(self):
+        return {key: self[key] for key in RESULT_FIELDS}
+
+
+RESULT_FIELDS = ('chunk_id', 'document_name', 'lecture', 'chunk_index', 'similarity_score', 'text',
+                 'from_reference')
+
+
+class RetrievalResults(list):
+    # The top-ranked RetrievedChunks, plus how many chunks were candidates and
+    # the best dense similarity among all of them (not necessarily self[0]
+    # when hybrid fusion re-ranks)
+    def __init__(self, chunks=(), num_candidates=None, top_similarity=None):
+        super().__init__(chunks)
+        self.num_candidates = len(self) if num_candidates is None else num_candidates
+        if top_similarity is None:
+            top_similarity = max((chunk.similarity_score for chunk in self), default=0.0)
+        self.top_similarity = top_similarity
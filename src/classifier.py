@@ -1,16 +1,38 @@
+import asyncio
 import re
-from semantic import get_embedding, get_relevant_chunks
+import time
+from functools import lru_cache, partial
+import numpy as np
+from semantic import get_embedding, get_relevant_chunks, find_referenced_chunks
 from processors import filter_question
+import metrics
 import config
 
+class KeywordMatcher:
+    def __init__(self, keywords):
+        self.keywords = tuple(keywords)
+        # One alternation answers "does any keyword occur"; longest first so
+        # multi-word phrases like "office hours" are tried before their prefixes
+        alternation = '|'.join(re.escape(kw) for kw in sorted(set(self.keywords), key=len, reverse=True))
+        self._any = re.compile(r'\b(?:' + alternation + r')\b')
+        self._each = [(kw, re.compile(r'\b' + re.escape(kw) + r'\b')) for kw in self.keywords]
+
+    def find(self, text):
+        text_lower = text.lower()
+        if not self._any.search(text_lower):
+            return []
+        # Only questions that will be redirected pay for listing every keyword
+        return [kw for kw, pattern in self._each if pattern.search(text_lower)]
+
+
+@lru_cache(maxsize=None)
+def _get_keyword_matcher(keywords):
+    return KeywordMatcher(keywords)
+
+
 def find_prefilter_keywords(text, keyword_lists):
-    text_lower = text.lower()
-    found = []
-    for keywords in keyword_lists:
-        for kw in keywords:
-            if re.search(r'\b' + re.escape(kw) + r'\b', text_lower):
-                found.append(kw)
-    return found
+    keywords = tuple(kw for keywords in keyword_lists for kw in keywords)
+    return _get_keyword_matcher(keywords).find(text)
 
 
 def classify_admin_exam(question):
@@ -22,21 +44,50 @@ def classify_admin_exam(question):
         return None, [], True
 
 
-def filter_question_hybrid(question, master_keywords, chunks_with_embeddings, confidence_threshold=None):
+def combine_confidence(keyword_count, top_similarity, k=None):
+    # Confidence calculation: k keyword + (1 - k) semantic; also works elementwise on arrays
+    if k is None:
+        k = config.OPTIMAL_K
+    keyword_confidence = np.minimum(keyword_count / 5, 1.0)
+    return (keyword_confidence * k) + (top_similarity * (1-k))
+
+
+def filter_question_hybrid(question, master_keywords, chunks_with_embeddings, confidence_threshold=None,
+                           retrieval_backend=None, reference_index=None, lexical_index=None,
+                           question_embedding=None, keyword_match=None, referenced_chunk_ids=None):
+    # question_embedding, keyword_match (a filter_question result) and
+    # referenced_chunk_ids can be computed ahead, e.g. concurrently
     if confidence_threshold is None:
         confidence_threshold = config.CONFIDENCE_THRESHOLD
 
     # Keyword filtering
-    _, keywords_found, keyword_count = filter_question(question, master_keywords, min_keywords=0)
+    if keyword_match is None:
+        with metrics.span("classify.keywords"):
+            keyword_match = filter_question(question, master_keywords, min_keywords=0)
+    _, keywords_found, keyword_count = keyword_match
     
     # Semantic filtering
-    relevant_chunks = get_relevant_chunks(question, chunks_with_embeddings, similarity_threshold=0)
+    if referenced_chunk_ids is None:
+        with metrics.span("classify.references"):
+            referenced_chunk_ids = find_referenced_chunks(question, chunks_with_embeddings, reference_index)
+    # Only embed when no reference short-circuits the search; the answer
+    # cache embeds lazily if it needs to compare questions
+    if question_embedding is None and not referenced_chunk_ids:
+        with metrics.span("classify.embedding"):
+            question_embedding = get_embedding(question)
+    with metrics.span("classify.retrieval"):
+        relevant_chunks = get_relevant_chunks(question, chunks_with_embeddings, similarity_threshold=0,
+                                              retrieval_backend=retrieval_backend,
+                                              question_embedding=question_embedding,
+                                              reference_index=reference_index,
+                                              lexical_index=lexical_index,
+                                              referenced_chunk_ids=referenced_chunk_ids,
+                                              top_k=config.RETRIEVAL_TOP_K)
     
-    top_similarity = relevant_chunks[0]['similarity_score'] if relevant_chunks else 0.0
+    # Best dense score over every candidate; hybrid ranking can put a lexical match first
+    top_similarity = relevant_chunks.top_similarity
     
-    # Confidence calculation: 30% keyword + 70% semantic
-    keyword_confidence = min(keyword_count / 5, 1.0)
-    final_confidence = (keyword_confidence * config.OPTIMAL_K) + (top_similarity * (1-config.OPTIMAL_K))
+    final_confidence = float(combine_confidence(keyword_count, top_similarity))
     
     return {
         'status': '✓ ACCEPTED' if final_confidence >= confidence_threshold else '✗ REJECTED',
@@ -47,29 +98,26 @@ def filter_question_hybrid(question, master_keywords, chunks_with_embeddings, co
         'is_relevant': final_confidence >= confidence_threshold,
         'confidence': final_confidence,
         'relevant_chunks': relevant_chunks,
-        'num_relevant_chunks': len(relevant_chunks)
+        'num_relevant_chunks': relevant_chunks.num_candidates,
+        'question_embedding': question_embedding
     }
 
 
-def classify_question_complete(question, master_keywords, chunks_with_embeddings, 
-                               confidence_threshold=0.50):
-    # Stage 1: Pre-filter for admin/exam keywords
-    admin_exam_classification, admin_exam_keywords, should_proceed = classify_admin_exam(question)
-    
-    if not should_proceed:
-        return {
-            'classification': admin_exam_classification,
-            'question': question,
-            'stage': 'Pre-filter (Admin/Exam Keywords)',
-            'admin_exam_keywords': admin_exam_keywords,
-            'semantic_results': None,
-            'confidence': 1.0
-        }
-    
-    # Stage 2: Semantic filtering with references
-    semantic_result = filter_question_hybrid(question, master_keywords, chunks_with_embeddings)
-    
+def _prefilter_result(question, admin_exam_classification, admin_exam_keywords):
+    metrics.increment("questions", classification=admin_exam_classification)
+    return {
+        'classification': admin_exam_classification,
+        'question': question,
+        'stage': 'Pre-filter (Admin/Exam Keywords)',
+        'admin_exam_keywords': admin_exam_keywords,
+        'semantic_results': None,
+        'confidence': 1.0
+    }
+
+
+def _semantic_result(question, semantic_result):
     classification = "Relevant (Chatbot)" if semantic_result['is_relevant'] else "Irrelevant"
+    metrics.increment("questions", classification=classification)
     
     return {
         'classification': classification,
@@ -79,3 +127,73 @@ def classify_question_complete(question, master_keywords, chunks_with_embeddings
         'semantic_results': semantic_result,
         'confidence': semantic_result['confidence']
     }
+
+
+def classify_question_complete(question, master_keywords, chunks_with_embeddings, 
+                               confidence_threshold=0.50, retrieval_backend=None, reference_index=None,
+                               lexical_index=None):
+    with metrics.span("classify.total"):
+        # Stage 1: Pre-filter for admin/exam keywords
+        with metrics.span("classify.prefilter"):
+            admin_exam_classification, admin_exam_keywords, should_proceed = classify_admin_exam(question)
+        
+        if not should_proceed:
+            return _prefilter_result(question, admin_exam_classification, admin_exam_keywords)
+        
+        # Stage 2: Semantic filtering with references
+        semantic_result = filter_question_hybrid(question, master_keywords, chunks_with_embeddings,
+                                                 retrieval_backend=retrieval_backend,
+                                                 reference_index=reference_index,
+                                                 lexical_index=lexical_index)
+        
+        return _semantic_result(question, semantic_result)
+
+
+async def aclassify_question_complete(question, master_keywords, chunks_with_embeddings,
+                                      retrieval_backend=None, reference_index=None, lexical_index=None,
+                                      executor=None, embed=None):
+    # embed: optional coroutine function text -> embedding, e.g. EmbeddingBatcher.embed
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+
+    # Stage 1: Pre-filter for admin/exam keywords
+    with metrics.span("classify.prefilter"):
+        admin_exam_classification, admin_exam_keywords, should_proceed = classify_admin_exam(question)
+    
+    if not should_proceed:
+        metrics.observe("classify.total", time.perf_counter() - start)
+        return _prefilter_result(question, admin_exam_classification, admin_exam_keywords)
+
+    # Stage 2: reference matching (microseconds of regex work) decides whether
+    # the query needs embedding; if so the embedding runs in the executor
+    # while keywords are counted on the loop
+    with metrics.span("classify.references"):
+        referenced_chunk_ids = find_referenced_chunks(question, chunks_with_embeddings, reference_index)
+    embedding_future = None
+    if not referenced_chunk_ids:
+        embedding_start = time.perf_counter()
+        if embed is None:
+            embedding_future = loop.run_in_executor(executor, get_embedding, question)
+        else:
+            embedding_future = asyncio.ensure_future(embed(question))
+    with metrics.span("classify.keywords"):
+        keyword_match = filter_question(question, master_keywords, min_keywords=0)
+    question_embedding = None
+    if embedding_future is not None:
+        question_embedding = await embedding_future
+        # Includes time queued for a micro-batch
+        metrics.observe("classify.embedding", time.perf_counter() - embedding_start)
+
+    # Scoring is CPU-bound too, so keep it off the event loop
+    semantic_result = await loop.run_in_executor(executor, partial(
+        filter_question_hybrid, question, master_keywords, chunks_with_embeddings,
+        retrieval_backend=retrieval_backend,
+        reference_index=reference_index,
+        lexical_index=lexical_index,
+        question_embedding=question_embedding,
+        keyword_match=keyword_match,
+        referenced_chunk_ids=referenced_chunk_ids
+    ))
+
+    metrics.observe("classify.total", time.perf_counter() - start)
+    return _semantic_result(question, semantic_result)
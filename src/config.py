@@ -53,11 +53,41 @@ CONFIDENCE_THRESHOLD = 0.25
 OPTIMAL_K = 0.15
 
 
+# ============================================================
+# RETRIEVAL BACKEND
+# ============================================================
+# "exact" scores every chunk; "ivf" is an approximate inverted-file index
+# for large multi-course corpora (built once, memory-mapped from IVF_INDEX_PATH)
+RETRIEVAL_BACKEND = "exact"
+# Number of clusters (None: 4 * sqrt(number of chunks)) and clusters scanned per query
+IVF_NLIST = None
+IVF_NPROBE = 16
+# Chunks materialised per question (prompt context and sources); the rest
+# are only counted
+RETRIEVAL_TOP_K = 5
+
+# ============================================================
+# HYBRID RETRIEVAL
+# ============================================================
+# BM25 over chunk text fused with the dense ranking: "rrf" (reciprocal rank
+# fusion), "weighted" (weighted sum of cosine and max-normalised BM25) or None
+HYBRID_FUSION = "rrf"
+RRF_K = 60
+HYBRID_LEXICAL_WEIGHT = 0.3
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
 # ============================================================
 # CHUNKING PARAMETERS
 # ============================================================
 CHUNK_SIZE = 1500
 CHUNK_OVERLAP = 200
+# Worker processes for chunking documents (None: one per CPU); a pool is only
+# started when at least INGESTION_PARALLEL_MIN_DOCUMENTS files need chunking,
+# since spawning workers costs about a second and a document a millisecond or two
+INGESTION_WORKERS = None
+INGESTION_PARALLEL_MIN_DOCUMENTS = 256
 CHUNK_SEPARATORS = ["\n\n", "\n", ". ", " "]
 
 
@@ -66,6 +96,28 @@ CHUNK_SEPARATORS = ["\n\n", "\n", ". ", " "]
 # ============================================================
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 EMBEDDING_MAX_LENGTH = 512
+# Chunks per forward pass when embedding the corpus
+EMBEDDING_BATCH_SIZE = 32
+# "torch" (PyTorch fp32) or "onnx" (ONNX Runtime, int8 dynamic quantization,
+# exported once into ONNX_MODEL_PATH)
+EMBEDDING_ENGINE = "torch"
+ONNX_MODEL_PATH = BASE_DIR / "data" / "onnx"
+# Threads running query embedding and scoring for CourseTutor.aprocess_question
+EMBEDDING_WORKERS = 2
+# Concurrent async questions are embedded together if they arrive within this window
+EMBEDDING_BATCH_WINDOW_MS = 5
+# Recent question embeddings kept in memory
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+
+# ============================================================
+# EMBEDDING INDEX
+# ============================================================
+# Persistent chunk embeddings, reused across restarts
+INDEX_PATH = BASE_DIR / "data" / "index"
+IVF_INDEX_PATH = INDEX_PATH / "ivf"
+# Seconds between checks of the lecture/exercise folders for added, changed or removed files
+CORPUS_WATCH_INTERVAL = 30
 
 
 # ============================================================
@@ -77,6 +129,51 @@ HF_MODEL = "Qwen/Qwen2.5-Math-1.5B"
 LLM_TEMPERATURE = 0.3
 LLM_TOP_P = 0.9
 LLM_NUM_PREDICT = 2048
+# Optional self-hosted / stub endpoint used instead of the HF_MODEL repo
+HF_ENDPOINT_URL = os.getenv("HF_ENDPOINT_URL")
+# Shared client: request timeout (seconds), retries with exponential backoff, HTTP pool size
+LLM_TIMEOUT = 120
+LLM_MAX_RETRIES = 2
+LLM_RETRY_BACKOFF = 0.5
+LLM_POOL_MAXSIZE = 16
+
+
+# ============================================================
+# ANSWER CACHE
+# ============================================================
+# Maximum cached answers, lifetime in seconds, and the question-embedding
+# cosine similarity above which a cached answer is reused
+ANSWER_CACHE_SIZE = 256
+ANSWER_CACHE_TTL = 24 * 60 * 60
+ANSWER_CACHE_SIMILARITY = 0.95
+
+
+# ============================================================
+# INTERACTION LOGGING
+# ============================================================
+# Rows are queued and written in batches of LOG_BATCH_SIZE or every
+# LOG_FLUSH_INTERVAL seconds; rows that cannot be written are spilled locally
+LOG_BATCH_SIZE = 20
+LOG_FLUSH_INTERVAL = 5.0
+LOG_QUEUE_SIZE = 1000
+LOG_SPILL_PATH = BASE_DIR / "data" / "logs" / "pending_logs.jsonl"
+
+
+# ============================================================
+# HTTP SERVER
+# ============================================================
+# Headless serving mode (src/server.py)
+SERVER_HOST = os.getenv("TUTOR_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("TUTOR_SERVER_PORT", "8000"))
+
+
+# ============================================================
+# METRICS
+# ============================================================
+# Per-stage latency histograms and outcome counters (src/metrics.py);
+# the server exposes them at /metrics, the app dumps them to METRICS_JSON_PATH on exit
+METRICS_ENABLED = True
+METRICS_JSON_PATH = BASE_DIR / "data" / "logs" / "metrics.json"
 
 
 # ============================================================
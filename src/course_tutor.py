@@ -1,75 +1,238 @@
-from txt_processor import load_lecture_texts, load_exercise_texts
-from processors import chunk_lectures_by_section, chunk_exercises_by_question, build_master_keywords
-from semantic import generate_chunk_embeddings
-from classifier import classify_question_complete
-from llm_handler import process_question_with_response
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from processors import build_master_keywords
+from embedding_index import IndexedEmbedder, corpus_fingerprint
+from semantic import build_embedding_matrix, EmbeddingBatcher
+from references import build_reference_index
+from retrieval import build_retrieval_backend
+from bm25 import BM25Index
+from chunk_store import ChunkStore
+from classifier import classify_question_complete, aclassify_question_complete
+from llm_handler import process_question_with_response, aprocess_question_with_response
+from answer_cache import AnswerCache
+from ingestion import scan_documents, diff_manifests, iter_document_chunks, embed_document_chunks, CorpusWatcher
+import metrics
 import config
 
+
+class CorpusState:
+    # Immutable snapshot of everything a question is answered against.
+    # Refreshes build a new snapshot and swap it in with one assignment.
+    # Chunks are kept only in the columnar store; the per-document dicts they
+    # were built from are dropped once the store exists.
+    def __init__(self, texts, document_chunks, master_keywords):
+        self.texts = texts
+        self.master_keywords = master_keywords
+
+        # Chunk position range of every document, in corpus order
+        self.document_ranges, start = {}, 0
+        for key, chunks in document_chunks.items():
+            self.document_ranges[key] = (start, start + len(chunks))
+            start += len(chunks)
+        chunks_with_embeddings = ChunkStore.from_chunks(
+            [chunk for chunks in document_chunks.values() for chunk in chunks])
+        self.chunks_with_embeddings = chunks_with_embeddings
+
+        with metrics.span("corpus.dense_index"):
+            self.embedding_matrix = build_embedding_matrix(chunks_with_embeddings)
+            self.fingerprint = corpus_fingerprint(chunks_with_embeddings)
+            self.retrieval_backend = build_retrieval_backend(self.embedding_matrix, self.fingerprint)
+        with metrics.span("corpus.reference_index"):
+            self.reference_index = build_reference_index(chunks_with_embeddings)
+        with metrics.span("corpus.lexical_index"):
+            self.lexical_index = BM25Index.build(chunks_with_embeddings.texts())
+
+    def document_chunks(self, key):
+        return self.chunks_with_embeddings.records(*self.document_ranges[key])
+
+
+# Document kinds in corpus order: all lectures, then all exercises
+DOCUMENT_KINDS = [
+    ('lecture', config.LECTURES_PATH),
+    ('exercise', config.EXERCISES_PATH),
+]
+
+
 class CourseTutor:
-    def __init__(self):
+    def __init__(self, watch=False, watch_interval=None):
         
         # Initialize components
         print("=" * 150)
         print("INITIALIZING COURSE TUTOR")
         print("=" * 150 + "\n")
-        
-        # Load TXT files
-        print("Loading lecture TXT files...")
-        self.lecture_texts = load_lecture_texts(config.LECTURES_PATH)
-        print(f"✓ Loaded {len(self.lecture_texts)} lecture files")
-
-        print("Loading exercise TXT files...")
-        self.exercise_texts = load_exercise_texts(config.EXERCISES_PATH)
-        print(f"✓ Loaded {len(self.exercise_texts)} exercise files\n")
-        
-        # Build keyword database
-        print("Building keyword database...")
-        all_texts = list(self.lecture_texts.values()) + list(self.exercise_texts.values())
-        self.master_keywords = build_master_keywords(all_texts)
-        print(f"✓ Master keywords: {len(self.master_keywords)} unique terms\n")
-        # Chunk lectures by section
-        print("Chunking lectures by section...")
-        self.lecture_chunks = chunk_lectures_by_section(self.lecture_texts)
-        print(f"✓ Created {len(self.lecture_chunks)} lecture chunks")
-        
-        # Chunk exercises by question
-        print("Chunking exercises by question...")
-        self.exercise_chunks = chunk_exercises_by_question(self.exercise_texts)
-        print(f"✓ Created {len(self.exercise_chunks)} exercise chunks")
-        
-        # Combine all chunks
-        self.all_chunks = self.lecture_chunks + self.exercise_chunks
-        print(f"✓ Total: {len(self.all_chunks)} chunks\n")
-        
-        # Generate embeddings
-        print("Generating embeddings for all chunks...")
-        self.chunks_with_embeddings = generate_chunk_embeddings(self.all_chunks)
+
+        start = time.perf_counter()
+        self._state = None
+        # Scan results the next refresh diffs against; only touched under _refresh_lock
+        self._manifests = {}
+        self._refresh_lock = threading.Lock()
+        self.answer_cache = AnswerCache()
+        # CPU-bound stages of aprocess_question run here, off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=config.EMBEDDING_WORKERS,
+                                            thread_name_prefix="tutor-embedding")
+        self.embedding_batcher = EmbeddingBatcher(self._executor)
+        self.refresh_corpus()
+        metrics.observe("startup.total", time.perf_counter() - start)
         
         print("=" * 150)
         print(f"✓ COURSE TUTOR READY")
         print(f"  Using optimal parameters: k={config.OPTIMAL_K:.2f}, threshold={config.CONFIDENCE_THRESHOLD:.2f}")
         print("=" * 150 + "\n")
+
+        self.watcher = CorpusWatcher(self, watch_interval).start() if watch else None
+
+
+    # Current snapshot; read once per question so a concurrent swap never mixes corpora
+    @property
+    def master_keywords(self):
+        return self._state.master_keywords
+
+    @property
+    def chunks_with_embeddings(self):
+        return self._state.chunks_with_embeddings
+
+    @property
+    def embedding_matrix(self):
+        return self._state.embedding_matrix
+
+    @property
+    def reference_index(self):
+        return self._state.reference_index
+
+    @property
+    def retrieval_backend(self):
+        return self._state.retrieval_backend
+
+    @property
+    def lexical_index(self):
+        return self._state.lexical_index
+
+
+    def refresh_corpus(self):
+        # Serialise refreshes; questions keep using the old snapshot meanwhile
+        with self._refresh_lock:
+            previous = self._state
+            manifests, diffs = {}, {}
+            with metrics.span("corpus.scan"):
+                for kind, directory in DOCUMENT_KINDS:
+                    old_manifest = self._manifests.get(kind, {})
+                    manifests[kind] = scan_documents(directory, old_manifest)
+                    diffs[kind] = diff_manifests(old_manifest, manifests[kind])
+
+            if previous is not None and not any(any(diff) for diff in diffs.values()):
+                # Only timestamps moved; remember them so the files are not re-hashed
+                self._manifests = manifests
+                return False
+
+            start = time.perf_counter()
+            # Re-read and re-chunk only added or changed files, in parallel for large batches
+            stale = {(kind, name) for kind, _ in DOCUMENT_KINDS for name in diffs[kind][0] + diffs[kind][1]}
+            print(f"Loading {len(stale)} new or changed TXT files...")
+            fresh = iter_document_chunks([(kind, directory / name) for kind, directory in DOCUMENT_KINDS
+                                          for name in manifests[kind] if (kind, name) in stale])
+
+            def corpus_documents():
+                # Every document in corpus order; unchanged ones come from the previous snapshot
+                for kind, _ in DOCUMENT_KINDS:
+                    for name in manifests[kind]:
+                        key = (kind, name)
+                        if key in stale:
+                            yield next(fresh)
+                        else:
+                            yield kind, name, previous.texts[key], previous.document_chunks(key)
+
+            # Documents are embedded as they stream in; cached embeddings are
+            # reused and only new or changed chunks go through the model
+            texts, document_chunks = {}, {}
+            embedder = IndexedEmbedder()
+            with metrics.span("corpus.ingest"):
+                for kind, name, text, chunks in embed_document_chunks(corpus_documents(), embedder):
+                    texts[(kind, name)] = text
+                    document_chunks[(kind, name)] = chunks
+            for kind, _ in DOCUMENT_KINDS:
+                added, changed, removed = diffs[kind]
+                print(f"✓ {len(manifests[kind])} {kind} files ({len(added)} added, {len(changed)} changed, "
+                      f"{len(removed)} removed)")
+
+            all_chunks = [chunk for chunks in document_chunks.values() for chunk in chunks]
+            print(f"✓ Total: {len(all_chunks)} chunks\n")
+            embedder.save(all_chunks)
+
+            # Build keyword database
+            print("\nBuilding keyword database...")
+            with metrics.span("corpus.keywords"):
+                master_keywords = build_master_keywords(list(texts.values()))
+            print(f"✓ Master keywords: {len(master_keywords)} unique terms\n")
+
+            state = CorpusState(texts, document_chunks, master_keywords)
+            metrics.observe("corpus.refresh", time.perf_counter() - start)
+            self._state = state
+            self._manifests = manifests
+            # Answer cache is tied to this exact corpus
+            self.answer_cache.set_corpus_version(state.fingerprint)
+            return True
     
 
     def classify_question(self, question):
+        state = self._state
         return classify_question_complete(
             question, 
-            self.master_keywords, 
-            self.chunks_with_embeddings
+            state.master_keywords, 
+            state.chunks_with_embeddings,
+            retrieval_backend=state.retrieval_backend,
+            reference_index=state.reference_index,
+            lexical_index=state.lexical_index
         )
     
 
-    def process_question(self, question):
+    def process_question(self, question, compare_without_context=False, stream=False):
+        # One classification and one LLM call per question; the no-context
+        # baseline is only generated when a comparison is requested
         classification_result = self.classify_question(question)
-        response_data = process_question_with_response(classification_result)
+        response_data = process_question_with_response(classification_result, stream=stream,
+                                                       answer_cache=self.answer_cache)
+
+        if compare_without_context:
+            response_data['response_without_context'] = self.process_question_no_context(question)['response']
+
         return response_data
     
 
-    def process_question_no_context(self, question):
-        from llm_handler import get_llm
+    async def aclassify_question(self, question):
+        state = self._state
+        return await aclassify_question_complete(
+            question,
+            state.master_keywords,
+            state.chunks_with_embeddings,
+            retrieval_backend=state.retrieval_backend,
+            reference_index=state.reference_index,
+            lexical_index=state.lexical_index,
+            executor=self._executor,
+            embed=self.embedding_batcher.embed
+        )
+
+
+    async def aprocess_question(self, question, compare_without_context=False, stream=False):
+        # The no-context baseline does not depend on classification, so it is
+        # requested straight away and overlaps with the main answer
+        baseline = None
+        if compare_without_context:
+            baseline = asyncio.create_task(self.aprocess_question_no_context(question))
+
+        classification_result = await self.aclassify_question(question)
+        response_data = await aprocess_question_with_response(classification_result, stream=stream,
+                                                              answer_cache=self.answer_cache)
+
+        if baseline is not None:
+            response_data['response_without_context'] = (await baseline)['response']
+
+        return response_data
+
 
-        llm = get_llm()
-        prompt = f"""You are a helpful university tutor for a decision and risk course for university undergraduates.
+    def _no_context_prompt(self, question):
+        return f"""You are a helpful university tutor for a decision and risk course for university undergraduates.
 
                 Answer the following question. 
                 If you don't have enough information to answer the question, say so honestly.
@@ -80,12 +243,31 @@ class CourseTutor:
         QUESTION: {question}
             
         ANSWER:"""
-        
+
+
+    def process_question_no_context(self, question):
+        from llm_handler import invoke_llm
+
         try:
-            llm_response = llm.invoke(prompt).content
+            llm_response = invoke_llm(self._no_context_prompt(question))
         except Exception as e:
             llm_response = f"Error generating response: {str(e)}"
         
+        return self._no_context_result(question, llm_response)
+
+
+    async def aprocess_question_no_context(self, question):
+        from llm_handler import ainvoke_llm
+
+        try:
+            llm_response = await ainvoke_llm(self._no_context_prompt(question))
+        except Exception as e:
+            llm_response = f"Error generating response: {str(e)}"
+
+        return self._no_context_result(question, llm_response)
+
+
+    def _no_context_result(self, question, llm_response):
         return {
             'question': question,
             'classification': 'Relevant (Chatbot)',
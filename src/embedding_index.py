@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import numpy as np
+from semantic import get_embeddings
+from models import embedding_engine_id
+import config
+
+# ============================================================
+# INDEX LAYOUT
+# ============================================================
+# embeddings.npy       float32 (N, d) matrix, opened memory-mapped
+# embeddings_meta.json one content key per matrix row
+
+MATRIX_FILE = "embeddings.npy"
+META_FILE = "embeddings_meta.json"
+
+
+def chunk_key(text):
+    # Any change to the text, the model, the engine or the truncation length invalidates the row
+    payload = f"{config.EMBEDDING_MODEL}\0{embedding_engine_id()}\0{config.EMBEDDING_MAX_LENGTH}\0{text}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def corpus_fingerprint(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk['chunk_id'].encode('utf-8'))
+        digest.update(chunk_key(chunk['text']).encode('ascii'))
+    return digest.hexdigest()
+
+
+def load_index(index_path=None):
+    index_path = Path(index_path or config.INDEX_PATH)
+    matrix_file = index_path / MATRIX_FILE
+    meta_file = index_path / META_FILE
+
+    if not matrix_file.exists() or not meta_file.exists():
+        return {}, None
+
+    try:
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            keys = json.load(f)['keys']
+        matrix = np.load(matrix_file, mmap_mode='r')
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Ignoring unreadable embedding index: {e}")
+        return {}, None
+
+    # Metadata is written after the matrix, so a mismatch means an interrupted save
+    if matrix.ndim != 2 or matrix.shape[0] != len(keys):
+        return {}, None
+
+    return {key: row for row, key in enumerate(keys)}, matrix
+
+
+def save_index(keys, matrix, index_path=None):
+    index_path = Path(index_path or config.INDEX_PATH)
+    index_path.mkdir(parents=True, exist_ok=True)
+
+    # Write to temporary files and rename so readers never see a partial index
+    tmp_matrix = index_path / (MATRIX_FILE + ".tmp")
+    with open(tmp_matrix, 'wb') as f:
+        np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+    os.replace(tmp_matrix, index_path / MATRIX_FILE)
+
+    tmp_meta = index_path / (META_FILE + ".tmp")
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump({
+            'model': config.EMBEDDING_MODEL,
+            'max_length': config.EMBEDDING_MAX_LENGTH,
+            'keys': list(keys)
+        }, f)
+    os.replace(tmp_meta, index_path / META_FILE)
+
+
+class IndexedEmbedder:
+    # Embeds chunks batch by batch, reusing rows of the on-disk index, then
+    # rewrites the index once for the whole corpus if it no longer matches
+    def __init__(self, index_path=None):
+        self.index_path = index_path
+        self.rows, self.matrix = load_index(index_path)
+        self.keys = []
+        self.generated = 0
+
+    def embed(self, chunks):
+        # Chunks must arrive in corpus order, so keys line up with save()
+        keys = [chunk_key(chunk['text']) for chunk in chunks]
+        missing = []
+        for chunk, key in zip(chunks, keys):
+            if key in self.rows:
+                chunk['embedding'] = self.matrix[self.rows[key]]
+            else:
+                missing.append(chunk)
+
+        if missing:
+            for chunk, embedding in zip(missing, get_embeddings([chunk['text'] for chunk in missing])):
+                chunk['embedding'] = embedding
+        self.keys.extend(keys)
+        self.generated += len(missing)
+        return chunks
+
+    def save(self, chunks):
+        # chunks: everything passed to embed(), in the same order
+        print(f"✓ Reused {len(chunks) - self.generated}/{len(chunks)} embeddings from index, "
+              f"generated {self.generated}")
+
+        # Rewrite only when the stored rows no longer mirror the corpus
+        keys = self.keys
+        if chunks and (self.generated or self.matrix.shape[0] != len(keys) or len(self.rows) != len(set(keys))):
+            save_index(keys, np.vstack([chunk['embedding'] for chunk in chunks]), self.index_path)
+            print(f"✓ Saved embedding index ({len(keys)} chunks)")
+
+
+def embed_chunks_with_index(chunks, index_path=None):
+    embedder = IndexedEmbedder(index_path)
+    embedder.embed(chunks)
+    embedder.save(chunks)
+    return chunks
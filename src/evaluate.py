@@ -0,0 +1,256 @@
+# ============================================================
+# BATCH EVALUATION AND THRESHOLD SWEEP
+# ============================================================
+# Usage: python src/evaluate.py questions.jsonl [--k 0 0.05 ...] [--confidence 0.2 0.25 ...]
+#
+# One JSON object per line:
+#   {"question": "...", "label": "relevant" | "irrelevant" | "redirect", "documents": ["Lecture 6.txt"]}
+# "label" and "documents" are optional. Questions are streamed in batches and
+# their query embeddings computed in bulk. Every classification stage runs once
+# per question; the grid over OPTIMAL_K, CONFIDENCE_THRESHOLD and
+# SIMILARITY_THRESHOLD is then evaluated on the stored stage outputs.
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from collections import defaultdict
+import numpy as np
+from course_tutor import CourseTutor
+from classifier import classify_admin_exam, combine_confidence
+from processors import filter_question
+from semantic import get_query_embeddings, get_relevant_chunks, find_referenced_chunks
+import config
+
+LABELS = {
+    'relevant': 'relevant', 'relevant (chatbot)': 'relevant', 'chatbot': 'relevant',
+    'irrelevant': 'irrelevant',
+    'redirect': 'redirect', 'redirect to lecturer': 'redirect',
+}
+
+# Chunks kept per question for the retrieval metrics
+TOP_CHUNKS = 5
+RANKED_CHUNKS = 50
+
+
+def read_questions(path, batch_size):
+    batch = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get('question'):
+                raise ValueError(f"Line {line_number}: missing 'question'")
+            label = record.get('label')
+            if label is not None and str(label).lower() not in LABELS:
+                # Treating it as unlabelled would quietly skew the tuning grid
+                raise ValueError(f"Line {line_number}: unknown label {label!r}, "
+                                 f"expected one of {', '.join(sorted(set(LABELS)))}")
+            batch.append(record)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+# ============================================================
+# STAGE OUTPUTS
+# ============================================================
+
+class StageResults:
+    # Per-question outputs of every parameter-independent stage
+    def __init__(self):
+        self.redirect = []
+        self.keyword_count = []
+        self.top_similarity = []
+        self.labels = []
+        # (RANKED_CHUNKS,) similarities in ranked order, and whether each
+        # chunk belongs to one of the question's labelled documents
+        self.ranked_similarity = []
+        self.ranked_match = []
+        self.has_documents = []
+        self.stage_seconds = defaultdict(float)
+
+    def __len__(self):
+        return len(self.redirect)
+
+
+def timed(results, stage, function, *args, **kwargs):
+    start = time.perf_counter()
+    value = function(*args, **kwargs)
+    results.stage_seconds[stage] += time.perf_counter() - start
+    return value
+
+
+def run_stages(tutor, records, results):
+    questions = [record['question'] for record in records]
+
+    # Prefilter first so redirected questions are never embedded
+    prefiltered = [timed(results, 'prefilter', classify_admin_exam, q)[2] for q in questions]
+    to_embed = [q for q, proceed in zip(questions, prefiltered) if proceed]
+    embeddings = iter(timed(results, 'embedding', get_query_embeddings, to_embed))
+
+    for record, question, proceed in zip(records, questions, prefiltered):
+        label = record.get('label')
+        results.labels.append(LABELS.get(str(label).lower()) if label is not None else None)
+        documents = set(record.get('documents') or [])
+        results.has_documents.append(bool(documents))
+        results.redirect.append(not proceed)
+
+        ranked_similarity = np.full(RANKED_CHUNKS, -np.inf, dtype=np.float32)
+        ranked_match = np.zeros(RANKED_CHUNKS, dtype=bool)
+        if not proceed:
+            results.keyword_count.append(0)
+            results.top_similarity.append(0.0)
+        else:
+            _, _, keyword_count = timed(results, 'keywords', filter_question,
+                                        question, tutor.master_keywords, min_keywords=0)
+            referenced = timed(results, 'references', find_referenced_chunks,
+                               question, tutor.chunks_with_embeddings, tutor.reference_index)
+            relevant_chunks = timed(results, 'retrieval', get_relevant_chunks,
+                                    question, tutor.chunks_with_embeddings, similarity_threshold=0,
+                                    retrieval_backend=tutor.retrieval_backend,
+                                    question_embedding=next(embeddings),
+                                    reference_index=tutor.reference_index,
+                                    lexical_index=tutor.lexical_index,
+                                    referenced_chunk_ids=referenced,
+                                    top_k=RANKED_CHUNKS)
+
+            results.keyword_count.append(keyword_count)
+            results.top_similarity.append(relevant_chunks.top_similarity)
+            for i, chunk in enumerate(relevant_chunks):
+                ranked_similarity[i] = chunk['similarity_score']
+                ranked_match[i] = chunk['document_name'] in documents
+
+        results.ranked_similarity.append(ranked_similarity)
+        results.ranked_match.append(ranked_match)
+
+
+# ============================================================
+# PARAMETER GRID
+# ============================================================
+
+def evaluate_grid(results, k_values, confidence_values, similarity_values):
+    redirect = np.array(results.redirect)
+    keyword_count = np.array(results.keyword_count, dtype=np.float64)
+    top_similarity = np.array(results.top_similarity, dtype=np.float64)
+    labels = np.array([label or '' for label in results.labels])
+    labelled = labels != ''
+    actual_relevant = labels == 'relevant'
+
+    ranked_similarity = np.vstack(results.ranked_similarity)
+    ranked_match = np.vstack(results.ranked_match)
+    has_documents = np.array(results.has_documents) & ~redirect
+
+    # (K, Q) confidences; thresholds broadcast over a third axis
+    k = np.asarray(k_values, dtype=np.float64)[:, None]
+    confidence = combine_confidence(keyword_count[None, :], top_similarity[None, :], k)
+    thresholds = np.asarray(confidence_values, dtype=np.float64)[None, :, None]
+    predicted_relevant = (confidence[:, None, :] >= thresholds) & ~redirect
+
+    tp = (predicted_relevant & actual_relevant & labelled).sum(axis=2)
+    predicted = (predicted_relevant & labelled).sum(axis=2)
+    actual = (actual_relevant & labelled).sum()
+    predicted_label = np.where(redirect, 'redirect', np.where(predicted_relevant, 'relevant', 'irrelevant'))
+    correct = ((predicted_label == labels) & labelled).sum(axis=2)
+
+    # Documents recall@TOP_CHUNKS: a labelled document among the first
+    # TOP_CHUNKS retrieved chunks that clear the similarity threshold
+    document_recall = {}
+    for similarity in similarity_values:
+        passes = ranked_similarity >= similarity
+        kept = passes & (np.cumsum(passes, axis=1) <= TOP_CHUNKS)
+        hits = (kept & ranked_match).any(axis=1)
+        document_recall[similarity] = hits[has_documents].mean() if has_documents.any() else None
+
+    rows = []
+    for (i, k_value), (j, threshold), similarity in itertools.product(
+            enumerate(k_values), enumerate(confidence_values), similarity_values):
+        precision = tp[i, j] / predicted[i, j] if predicted[i, j] else 0.0
+        recall = tp[i, j] / actual if actual else 0.0
+        rows.append({
+            'k': k_value,
+            'confidence_threshold': threshold,
+            'similarity_threshold': similarity,
+            'precision': precision,
+            'recall': recall,
+            'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            'accuracy': correct[i, j] / labelled.sum() if labelled.any() else None,
+            'accepted_rate': predicted_relevant[i, j].mean() if len(redirect) else 0.0,
+            'document_recall': document_recall[similarity],
+        })
+    return rows
+
+
+def print_report(results, rows, top, total_seconds, grid_seconds):
+    n = len(results)
+    print(f"\nQuestions: {n} ({sum(label is not None for label in results.labels)} labelled, "
+          f"{sum(results.redirect)} redirected by the prefilter)")
+    print(f"Stages run once per question in {total_seconds:.2f}s; "
+          f"{len(rows)} parameter combinations evaluated in {grid_seconds * 1000:.1f} ms\n")
+
+    print(f"{'stage':<12} {'total s':>9} {'per question':>13}")
+    for stage in ('prefilter', 'embedding', 'keywords', 'references', 'retrieval'):
+        seconds = results.stage_seconds[stage]
+        print(f"{stage:<12} {seconds:>9.3f} {seconds / max(n, 1) * 1000:>11.3f}ms")
+
+    def fmt(value):
+        return f"{value:.3f}" if value is not None else "  -  "
+
+    print(f"\n{'k':>5} {'conf':>6} {'sim':>5} {'prec':>6} {'recall':>6} {'f1':>6} {'acc':>6} "
+          f"{'accept':>6} {'doc@5':>6}")
+    current = [r for r in rows if np.isclose(r['k'], config.OPTIMAL_K)
+               and np.isclose(r['confidence_threshold'], config.CONFIDENCE_THRESHOLD)
+               and np.isclose(r['similarity_threshold'], config.SIMILARITY_THRESHOLD)]
+    best = sorted(rows, key=lambda r: (r['f1'], r['accuracy'] or 0.0), reverse=True)[:top]
+    for row in current + best:
+        marker = "  <- config.py" if row in current else ""
+        print(f"{row['k']:>5.2f} {row['confidence_threshold']:>6.2f} {row['similarity_threshold']:>5.2f} "
+              f"{row['precision']:>6.3f} {row['recall']:>6.3f} {row['f1']:>6.3f} {fmt(row['accuracy']):>6} "
+              f"{row['accepted_rate']:>6.3f} {fmt(row['document_recall']):>6}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the classifier over a JSONL question set")
+    parser.add_argument("questions", help="JSONL file with a 'question' per line")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--k", type=float, nargs="+", default=np.round(np.arange(0, 0.55, 0.05), 2).tolist())
+    parser.add_argument("--confidence", type=float, nargs="+",
+                        default=np.round(np.arange(0.1, 0.55, 0.05), 2).tolist())
+    parser.add_argument("--similarity", type=float, nargs="+", default=[config.SIMILARITY_THRESHOLD])
+    parser.add_argument("--top", type=int, default=10, help="Best combinations to print")
+    parser.add_argument("--output", help="Write every grid row to this JSON file")
+    args = parser.parse_args()
+
+    # Always include the values currently in config.py so they appear in the report
+    k_values = sorted(set(args.k) | {config.OPTIMAL_K})
+    confidence_values = sorted(set(args.confidence) | {config.CONFIDENCE_THRESHOLD})
+    similarity_values = sorted(set(args.similarity) | {config.SIMILARITY_THRESHOLD})
+
+    tutor = CourseTutor()
+    results = StageResults()
+    start = time.perf_counter()
+    for records in read_questions(args.questions, args.batch_size):
+        run_stages(tutor, records, results)
+        print(f"✓ {len(results)} questions processed", file=sys.stderr)
+    total_seconds = time.perf_counter() - start
+    if not results:
+        sys.exit(f"No questions found in {args.questions}")
+
+    start = time.perf_counter()
+    rows = evaluate_grid(results, k_values, confidence_values, similarity_values)
+    grid_seconds = time.perf_counter() - start
+
+    print_report(results, rows, args.top, total_seconds, grid_seconds)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2, default=float)
+        print(f"\n✓ Grid written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
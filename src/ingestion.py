@@ -0,0 +1,146 @@
+import hashlib
+import itertools
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from txt_processor import read_text_file
+from processors import chunk_lecture, chunk_exercise
+import config
+
+# ============================================================
+# CHANGE DETECTION
+# ============================================================
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan_documents(directory, previous=None):
+    # name -> (mtime_ns, size, sha256); files whose mtime and size are
+    # unchanged keep their previous hash instead of being re-read
+    previous = previous or {}
+    manifest = {}
+    for txt_file in sorted(Path(directory).glob('*.txt')):
+        stat = txt_file.stat()
+        old = previous.get(txt_file.name)
+        if old and old[0] == stat.st_mtime_ns and old[1] == stat.st_size:
+            manifest[txt_file.name] = old
+        else:
+            manifest[txt_file.name] = (stat.st_mtime_ns, stat.st_size, file_sha256(txt_file))
+    return manifest
+
+
+def diff_manifests(previous, current):
+    added = [name for name in current if name not in previous]
+    removed = [name for name in previous if name not in current]
+    changed = [name for name in current
+               if name in previous and previous[name][2] != current[name][2]]
+    return added, changed, removed
+
+
+# ============================================================
+# STREAMING INGESTION PIPELINE
+# ============================================================
+# Documents flow load -> section split -> sub-split in worker processes and
+# come back one document at a time, in input order; embed_document_chunks
+# then embeds them in batches in the calling process. At most max_in_flight
+# documents are queued or being chunked, so memory is bounded by that window
+# and by whatever the consumer keeps, not by the corpus size.
+
+DOCUMENT_CHUNKERS = {
+    'lecture': chunk_lecture,
+    'exercise': chunk_exercise,
+}
+
+
+def chunk_document(kind, path, chunk_size=None):
+    # (kind, name, text, chunks) for one file; runs in a worker process
+    path = Path(path)
+    text = read_text_file(path)
+    return kind, path.name, text, DOCUMENT_CHUNKERS[kind](path.name, text, chunk_size)
+
+
+def iter_document_chunks(documents, workers=None, max_in_flight=None, chunk_size=None):
+    # documents: iterable of (kind, path)
+    workers = workers or config.INGESTION_WORKERS or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    chunk_size = chunk_size or config.CHUNK_SIZE
+    documents = iter(documents)
+
+    # Starting a pool costs more than chunking a handful of files
+    head = list(itertools.islice(documents, config.INGESTION_PARALLEL_MIN_DOCUMENTS))
+    if workers <= 1 or len(head) < config.INGESTION_PARALLEL_MIN_DOCUMENTS:
+        for kind, path in itertools.chain(head, documents):
+            yield chunk_document(kind, path, chunk_size)
+        return
+
+    # Workers are spawned, not forked: the caller may be a thread of a process
+    # running other threads (model warm-up, log writer), and forking those can
+    # deadlock the child
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for kind, path in itertools.chain(head, documents):
+            pending.append(pool.submit(chunk_document, kind, path, chunk_size))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def embed_document_chunks(chunked_documents, embedder=None, batch_size=None):
+    # Embedding stage: buffers whole documents until a batch is full, embeds
+    # their chunks through the embedding index (only chunks it does not hold
+    # are run through the model) and yields the documents with 'embedding' set.
+    # Imported here so chunking workers never load the embedding stack
+    from embedding_index import IndexedEmbedder
+
+    embedder = embedder or IndexedEmbedder()
+    batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+    buffered, buffered_chunks = [], 0
+
+    def flush():
+        embedder.embed([chunk for _, _, _, document_chunks in buffered for chunk in document_chunks])
+        yield from buffered
+        buffered.clear()
+
+    for document in chunked_documents:
+        buffered.append(document)
+        buffered_chunks += len(document[3])
+        if buffered_chunks >= batch_size:
+            yield from flush()
+            buffered_chunks = 0
+    yield from flush()
+
+
+# ============================================================
+# FILE WATCHING
+# ============================================================
+
+class CorpusWatcher:
+    def __init__(self, tutor, interval=None):
+        self.tutor = tutor
+        self.interval = interval or config.CORPUS_WATCH_INTERVAL
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="corpus-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(self.interval)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tutor.refresh_corpus()
+            except Exception as e:
+                print(f"⚠️ Corpus refresh failed: {e}")
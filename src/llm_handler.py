@@ -1,26 +1,160 @@
+import asyncio
+import metrics
 import config
 import os
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+import threading
+import time
+from semantic import get_embedding
+
+# Process-wide client shared by every Streamlit session
+_llm = None
+_llm_lock = threading.Lock()
+_http_session = None
+
+
+def _configure_http_pool():
+    # huggingface_hub sends inference requests through a pluggable requests
+    # session; share one keep-alive pool instead of a session per thread
+    try:
+        from huggingface_hub import configure_http_backend
+        import requests
+        from requests.adapters import HTTPAdapter
+    except ImportError as e:
+        # configure_http_backend was removed in huggingface_hub 1.0
+        print(f"⚠️ Shared LLM connection pool disabled: {e}")
+        return
+
+    def backend_factory():
+        global _http_session
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=config.LLM_POOL_MAXSIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+    configure_http_backend(backend_factory=backend_factory)
+
+
+def _create_llm():
+    from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 
-def get_llm():
     api_key = os.getenv("HUGGINGFACE_API_KEY")
 
     if not api_key:
             raise ValueError("HUGGINGFACE_API_KEY environment variable not set")
 
+    if config.HF_ENDPOINT_URL:
+        target = {'endpoint_url': config.HF_ENDPOINT_URL}
+    else:
+        target = {'repo_id': config.HF_MODEL}
+
     llm_endpoint = HuggingFaceEndpoint(
-        repo_id=config.HF_MODEL,
+        **target,
         huggingfacehub_api_token=api_key,
         task="conversational",
         do_sample=True,
         max_new_tokens=config.LLM_NUM_PREDICT,
         temperature=config.LLM_TEMPERATURE,
-        top_p=config.LLM_TOP_P
+        top_p=config.LLM_TOP_P,
+        timeout=config.LLM_TIMEOUT
     )
 
     return ChatHuggingFace(llm=llm_endpoint)
 
-import re
+
+def get_llm():
+    global _llm
+
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _configure_http_pool()
+                _llm = _create_llm()
+
+    return _llm
+
+
+# Only failures a retry can fix: timeouts, dropped connections, rate limits
+# and server errors. Auth and request errors (401, 400, ...) fail at once.
+RETRYABLE_STATUS = {408, 425, 429}
+
+
+def _is_transient(error):
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'status_code', None) \
+        or getattr(error, 'status', None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    # requests, httpx and aiohttp timeout / connection error classes
+    return any('Timeout' in cls.__name__ or 'Connect' in cls.__name__ for cls in type(error).__mro__)
+
+
+def invoke_llm(prompt, llm=None):
+    if llm is None:
+        llm = get_llm()
+
+    for attempt in range(config.LLM_MAX_RETRIES + 1):
+        try:
+            return llm.invoke(prompt).content
+        except Exception as e:
+            if attempt == config.LLM_MAX_RETRIES or not _is_transient(e):
+                raise
+            time.sleep(config.LLM_RETRY_BACKOFF * (2 ** attempt))
+
+
+def stream_llm(prompt, llm=None):
+    if llm is None:
+        llm = get_llm()
+
+    for attempt in range(config.LLM_MAX_RETRIES + 1):
+        started = False
+        try:
+            for chunk in llm.stream(prompt):
+                started = True
+                if chunk.content:
+                    yield chunk.content
+            return
+        except Exception as e:
+            # Tokens already shown to the student cannot be retracted
+            if started or attempt == config.LLM_MAX_RETRIES or not _is_transient(e):
+                raise
+            time.sleep(config.LLM_RETRY_BACKOFF * (2 ** attempt))
+
+
+async def ainvoke_llm(prompt, llm=None):
+    if llm is None:
+        llm = get_llm()
+
+    for attempt in range(config.LLM_MAX_RETRIES + 1):
+        try:
+            return (await llm.ainvoke(prompt)).content
+        except Exception as e:
+            if attempt == config.LLM_MAX_RETRIES or not _is_transient(e):
+                raise
+            await asyncio.sleep(config.LLM_RETRY_BACKOFF * (2 ** attempt))
+
+
+async def astream_llm(prompt, llm=None):
+    if llm is None:
+        llm = get_llm()
+
+    for attempt in range(config.LLM_MAX_RETRIES + 1):
+        started = False
+        try:
+            async for chunk in llm.astream(prompt):
+                started = True
+                if chunk.content:
+                    yield chunk.content
+            return
+        except Exception as e:
+            # Tokens already shown to the student cannot be retracted
+            if started or attempt == config.LLM_MAX_RETRIES or not _is_transient(e):
+                raise
+            await asyncio.sleep(config.LLM_RETRY_BACKOFF * (2 ** attempt))
 
 
 def convert_latex_delimiters(text):
@@ -35,11 +169,43 @@ def convert_latex_delimiters(text):
     return text
 
 
+class LatexStreamConverter:
+    # Delimiters are a backslash, an optional space and a bracket, so a trailing
+    # backslash (plus space) is held back until the next token completes it
+    def __init__(self):
+        self.pending = ""
 
-def generate_chatbot_response(question, relevant_chunks, llm=None):
-    if llm is None:
-        llm = get_llm()
-    
+    def feed(self, token):
+        self.pending += token
+        if self.pending.endswith('\\'):
+            cut = len(self.pending) - 1
+        elif self.pending.endswith('\\ '):
+            cut = len(self.pending) - 2
+        else:
+            cut = len(self.pending)
+
+        text, self.pending = self.pending[:cut], self.pending[cut:]
+        return convert_latex_delimiters(text)
+
+    def flush(self):
+        text, self.pending = self.pending, ""
+        return convert_latex_delimiters(text)
+
+
+def convert_latex_stream(tokens):
+    converter = LatexStreamConverter()
+    for token in tokens:
+        text = converter.feed(token)
+        if text:
+            yield text
+
+    text = converter.flush()
+    if text:
+        yield text
+
+
+
+def build_prompt(question, relevant_chunks):
     context = "\n\n---\n\n".join([
         f"[From {chunk['lecture']}, chunk {chunk['chunk_index']}]\n{chunk['text']}"
         for chunk in relevant_chunks[:5]
@@ -57,46 +223,121 @@ def generate_chatbot_response(question, relevant_chunks, llm=None):
                 QUESTION: {question}
                 """
 
-    response = llm.invoke(prompt).content
+    return prompt
+
+
+def generate_chatbot_response(question, relevant_chunks, llm=None):
+    if llm is None:
+        llm = get_llm()
+
+    prompt = build_prompt(question, relevant_chunks)
+    response = invoke_llm(prompt, llm)
     # response = convert_latex_delimiters(response)
 
     return response
 
 
+def stream_chatbot_response(question, relevant_chunks, llm=None, on_complete=None):
+    try:
+        prompt = build_prompt(question, relevant_chunks)
+        start = time.perf_counter()
+        converter = LatexStreamConverter()
+        # The answer cache holds raw LLM text, the same form invoke returns
+        tokens = []
+        for token in stream_llm(prompt, llm):
+            if not tokens:
+                metrics.observe("llm.first_token", time.perf_counter() - start)
+            tokens.append(token)
+            text = converter.feed(token)
+            if text:
+                yield text
+        text = converter.flush()
+        if text:
+            yield text
+        metrics.observe("llm.stream", time.perf_counter() - start)
+        if on_complete is not None:
+            on_complete(''.join(tokens), time.perf_counter() - start)
+    except Exception as e:
+        metrics.increment("llm_errors")
+        yield f"Error generating response: {str(e)}"
+
+
+async def astream_chatbot_response(question, relevant_chunks, llm=None, on_complete=None):
+    try:
+        prompt = build_prompt(question, relevant_chunks)
+        start = time.perf_counter()
+        converter = LatexStreamConverter()
+        tokens = []
+        async for token in astream_llm(prompt, llm):
+            if not tokens:
+                metrics.observe("llm.first_token", time.perf_counter() - start)
+            tokens.append(token)
+            text = converter.feed(token)
+            if text:
+                yield text
+        text = converter.flush()
+        if text:
+            yield text
+        metrics.observe("llm.stream", time.perf_counter() - start)
+        if on_complete is not None:
+            on_complete(''.join(tokens), time.perf_counter() - start)
+    except Exception as e:
+        metrics.increment("llm_errors")
+        yield f"Error generating response: {str(e)}"
+
 
-def process_question_with_response(classification_result):
+
+def _fixed_response(classification_result):
+    # Redirected and irrelevant questions never reach the LLM
     classification = classification_result['classification']
-    question = classification_result['question']
-    
-    # Handle admin/exam redirect
     if classification == "Redirect to lecturer":
-        return {
-            'question': question,
-            'classification': classification,
-            'response': config.REDIRECT_MESSAGE,
-            'sources': [],
-            'num_sources': 0
-        }
-    
-    # Handle irrelevant questions
-    if classification == "Irrelevant":
-        return {
-            'question': question,
-            'classification': classification,
-            'response': config.IRRELEVANT_MESSAGE,
-            'sources': [],
-            'num_sources': 0
-        }
-    
-    # Handle relevant questions with chatbot response
+        response = config.REDIRECT_MESSAGE
+    elif classification == "Irrelevant":
+        response = config.IRRELEVANT_MESSAGE
+    else:
+        return None
+
+    return {
+        'question': classification_result['question'],
+        'classification': classification,
+        'response': response,
+        'sources': [],
+        'num_sources': 0,
+        'confidence': classification_result['confidence']
+    }
+
+
+def _lookup_cached_response(classification_result, answer_cache):
+    # Cached answers are keyed on the chunks they were grounded in
+    question = classification_result['question']
     relevant_chunks = classification_result['semantic_results']['relevant_chunks']
-    
-    try:
-        llm = get_llm()
-        llm_response = generate_chatbot_response(question, relevant_chunks, llm)
-    except Exception as e:
-        llm_response = f"Error generating response: {str(e)}"
-    
+    chunk_ids = [chunk['chunk_id'] for chunk in relevant_chunks[:5]]
+    embedding = classification_result['semantic_results'].get('question_embedding')
+
+    def question_embedding():
+        # Questions answered from references were never embedded; only the
+        # cache's similarity fallback and put need it
+        nonlocal embedding
+        if embedding is None:
+            embedding = get_embedding(question)
+        return embedding
+
+    cached_response = None
+    if answer_cache is not None:
+        with metrics.span("answer.cache_lookup"):
+            cached_response = answer_cache.get(question, chunk_ids, question_embedding)
+        metrics.increment("answer_cache", result="hit" if cached_response is not None else "miss")
+
+    def cache_response(response, latency):
+        if answer_cache is not None:
+            answer_cache.put(question, chunk_ids, response, latency, question_embedding)
+
+    return cached_response, cache_response
+
+
+def _chatbot_response(classification_result, llm_response, response_stream):
+    semantic_results = classification_result['semantic_results']
+    relevant_chunks = semantic_results['relevant_chunks']
     sources = [
         {
             'lecture': chunk['lecture'],
@@ -108,10 +349,80 @@ def process_question_with_response(classification_result):
     ]
     
     return {
-        'question': question,
-        'classification': classification,
+        'question': classification_result['question'],
+        'classification': classification_result['classification'],
         'response': llm_response,
+        'response_stream': response_stream,
         'sources': sources,
-        'num_sources': len(relevant_chunks),
+        'num_sources': semantic_results['num_relevant_chunks'],
         'confidence': classification_result['confidence']
     }
+
+
+def process_question_with_response(classification_result, stream=False, answer_cache=None):
+    fixed_response = _fixed_response(classification_result)
+    if fixed_response is not None:
+        return fixed_response
+    
+    # Handle relevant questions with chatbot response
+    question = classification_result['question']
+    relevant_chunks = classification_result['semantic_results']['relevant_chunks']
+    cached_response, cache_response = _lookup_cached_response(classification_result, answer_cache)
+
+    # Streaming defers the LLM call until the caller iterates 'response_stream'
+    llm_response = None
+    response_stream = None
+    if cached_response is not None:
+        llm_response = cached_response
+        if stream:
+            response_stream = iter([convert_latex_delimiters(cached_response)])
+    elif stream:
+        response_stream = stream_chatbot_response(question, relevant_chunks, on_complete=cache_response)
+    else:
+        try:
+            llm = get_llm()
+            start = time.perf_counter()
+            llm_response = generate_chatbot_response(question, relevant_chunks, llm)
+            metrics.observe("llm.generate", time.perf_counter() - start)
+            cache_response(llm_response, time.perf_counter() - start)
+        except Exception as e:
+            metrics.increment("llm_errors")
+            llm_response = f"Error generating response: {str(e)}"
+    
+    return _chatbot_response(classification_result, llm_response, response_stream)
+
+
+async def aprocess_question_with_response(classification_result, stream=False, answer_cache=None):
+    # Same as process_question_with_response, but 'response_stream' is an
+    # async iterator and the LLM call is awaited
+    fixed_response = _fixed_response(classification_result)
+    if fixed_response is not None:
+        return fixed_response
+
+    question = classification_result['question']
+    relevant_chunks = classification_result['semantic_results']['relevant_chunks']
+    cached_response, cache_response = _lookup_cached_response(classification_result, answer_cache)
+
+    llm_response = None
+    response_stream = None
+    if cached_response is not None:
+        llm_response = cached_response
+        if stream:
+            response_stream = _aiter_once(convert_latex_delimiters(cached_response))
+    elif stream:
+        response_stream = astream_chatbot_response(question, relevant_chunks, on_complete=cache_response)
+    else:
+        try:
+            start = time.perf_counter()
+            llm_response = await ainvoke_llm(build_prompt(question, relevant_chunks))
+            metrics.observe("llm.generate", time.perf_counter() - start)
+            cache_response(llm_response, time.perf_counter() - start)
+        except Exception as e:
+            metrics.increment("llm_errors")
+            llm_response = f"Error generating response: {str(e)}"
+
+    return _chatbot_response(classification_result, llm_response, response_stream)
+
+
+async def _aiter_once(text):
+    yield text
@@ -1,55 +1,282 @@
-import gspread
-from google.oauth2.service_account import Credentials
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
 import streamlit as st
 from datetime import datetime
+import config
 
-class SheetLogger:
-    def __init__(self, spreadsheet_id: str, worksheet_name: str = "Logs"):
+LOG_HEADER = ["Timestamp", "User", "Question", "Answer", "Model", "Status"]
+
+
+# ============================================================
+# SINKS
+# ============================================================
+
+class SheetSink:
+    def __init__(self, worksheet=None, connect=None):
+        # connect opens the worksheet when there is none yet; it raises while
+        # the remote is unavailable, so the writer spills those rows
+        self.worksheet = worksheet
+        self.connect = connect
+
+    def write_rows(self, rows):
+        if self.worksheet is None:
+            if self.connect is None:
+                raise RuntimeError("No worksheet to write to")
+            self.worksheet = self.connect()
+        self.worksheet.append_rows(rows, value_input_option="RAW")
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write_rows(self, rows):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+
+class SQLiteSink:
+    def __init__(self, path):
+        self.path = str(path)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS logs "
+                "(timestamp TEXT, user TEXT, question TEXT, answer TEXT, model TEXT, status TEXT)"
+            )
+
+    def write_rows(self, rows):
+        # Connect per batch: the writer thread is not the thread that created the sink
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany("INSERT INTO logs VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+# ============================================================
+# BACKGROUND WRITER
+# ============================================================
+
+class BackgroundLogWriter:
+    def __init__(self, sink, spill_path=None, batch_size=None, flush_interval=None, max_queue=None):
+        self.sink = sink
+        self.spill_path = Path(spill_path or config.LOG_SPILL_PATH)
+        self.batch_size = batch_size or config.LOG_BATCH_SIZE
+        self.flush_interval = flush_interval or config.LOG_FLUSH_INTERVAL
+
+        self._queue = queue.Queue(maxsize=max_queue or config.LOG_QUEUE_SIZE)
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row):
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # Never block a request on logging; keep the row for later replay
+            self._spill([row])
+        return True
+
+    def close(self, timeout=10):
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join(timeout)
+
+    def _run(self):
+        # Nothing below may kill the thread, or every later row would be lost
+        try:
+            self._recover()
+        except Exception as e:
+            print(f"⚠️ Recovering spilled logs failed: {e}")
+        batch = []
+        deadline = None
+        while not (self._stop.is_set() and self._queue.empty()):
+            timeout = self.flush_interval if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                batch.append(self._queue.get(timeout=min(timeout, 0.5)))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            except queue.Empty:
+                pass
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline or self._stop.is_set()):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, rows):
+        try:
+            self.sink.write_rows(rows)
+        except Exception as e:
+            print(f"⚠️ Log sink unavailable, spilling {len(rows)} rows: {e}")
+            self._spill(rows)
+            return
+        # The remote is reachable again, so retry anything spilled earlier
+        try:
+            self._replay()
+        except Exception as e:
+            print(f"⚠️ Replay of spilled logs failed: {e}")
+
+    def _spill(self, rows):
+        try:
+            with self._spill_lock:
+                self._append_spill(rows)
+        except OSError as e:
+            print(f"⚠️ Could not spill {len(rows)} log rows, dropping them: {e}")
+
+    def _append_spill(self, rows):
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, 'a+b') as f:
+            # Start on a fresh line if a crash left the last one torn
+            if self.spill_path.stat().st_size:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            for row in rows:
+                f.write((json.dumps(row) + "\n").encode('utf-8'))
+
+    def _recover(self):
+        # A process that died mid-replay leaves its replay file behind; merge
+        # those rows back into the spill file, then replay whatever is pending.
+        # Replay files of live processes (e.g. the app and the server sharing
+        # the spill file) are still in flight and left alone.
+        with self._spill_lock:
+            for replay_path in sorted(self.spill_path.parent.glob(f"{self.spill_path.stem}.*replay")):
+                if _replay_owner_alive(replay_path):
+                    continue
+                self._append_spill(self._read_rows(replay_path))
+                replay_path.unlink(missing_ok=True)
+        self._replay()
+
+    def _replay(self):
+        with self._spill_lock:
+            if not self.spill_path.exists() or self.spill_path.stat().st_size == 0:
+                return
+            # Unique per replay, so a leftover file is never overwritten
+            replay_path = self.spill_path.with_name(
+                f"{self.spill_path.stem}.{os.getpid()}.{time.time_ns()}.replay")
+            os.replace(self.spill_path, replay_path)
+
+        rows = self._read_rows(replay_path)
+        written = 0
+        try:
+            while written < len(rows):
+                self.sink.write_rows(rows[written:written + self.batch_size])
+                written += self.batch_size
+        except Exception as e:
+            print(f"⚠️ Replay of spilled logs failed: {e}")
+            self._spill(rows[written:])
+        replay_path.unlink()
+
+    def _read_rows(self, path):
+        # Lines a crash tore mid-write cannot be decoded; they are set aside
+        # in a .corrupt file rather than blocking every row after them
+        rows, corrupt = [], []
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    corrupt.append(line.rstrip("\n") + "\n")
+        if corrupt:
+            print(f"⚠️ Skipping {len(corrupt)} unreadable lines in {path.name}")
+            with open(self.spill_path.with_name(f"{self.spill_path.stem}.corrupt"), 'a', encoding='utf-8') as f:
+                f.writelines(corrupt)
+        return rows
+
+
+def _replay_owner_alive(replay_path):
+    # Replay files are named <stem>.<pid>.<time_ns>.replay; older ones carry no pid
+    parts = replay_path.name.split('.')
+    if len(parts) < 4 or not parts[-3].isdigit():
+        return False
+    pid = int(parts[-3])
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but belongs to someone else
+        return True
+    return True
+
+
+# ============================================================
+# LOGGERS
+# ============================================================
+
+class InteractionLogger:
+    def __init__(self, sink, **writer_options):
+        self.writer = BackgroundLogWriter(sink, **writer_options) if sink is not None else None
+
+    def log_interaction(self, user: str, question: str, answer: str, model: str, status: str = "success"):
+        if not self.writer:
+            return False
+
+        row = [
+            datetime.now().isoformat(),
+            user,
+            question[:500],
+            answer[:500],
+            model,
+            status
+        ]
+        return self.writer.submit(row)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+
+class SheetLogger(InteractionLogger):
+    def __init__(self, spreadsheet_id: str, worksheet_name: str = "Logs", **writer_options):
         self.spreadsheet_id = spreadsheet_id
         self.worksheet_name = worksheet_name
         self.worksheet = None
         self._authenticate()
-    
+        # Without a worksheet rows spill locally until the sink can reconnect
+        super().__init__(SheetSink(self.worksheet, connect=self._open_worksheet), **writer_options)
+
     def _authenticate(self):
         try:
-            # Get credentials from Streamlit secrets
-            creds_dict = st.secrets["gcp_service_account"]
-            
-            scopes = [
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive"
-            ]
-            credentials = Credentials.from_service_account_info(creds_dict, scopes=scopes)
-            client = gspread.authorize(credentials)
-            
-            spreadsheet = client.open_by_key(self.spreadsheet_id)
-            
-            try:
-                self.worksheet = spreadsheet.worksheet(self.worksheet_name)
-            except gspread.exceptions.WorksheetNotFound:
-                self.worksheet = spreadsheet.add_worksheet(self.worksheet_name, rows=100, cols=10)
-                self.worksheet.append_row(["Timestamp", "User", "Question", "Answer", "Model", "Status"])
-        
+            self.worksheet = self._open_worksheet()
         except Exception as e:
             st.error(f"Google Sheets authentication failed: {e}")
             self.worksheet = None
-    
-    def log_interaction(self, user: str, question: str, answer: str, model: str, status: str = "success"):
-        if not self.worksheet:
-            return False
-        
-        try:
-            row = [
-                datetime.now().isoformat(),
-                user,
-                question[:500],
-                answer[:500],
-                model,
-                status
-            ]
-            self.worksheet.append_row(row, value_input_option="RAW")
-            return True
-        except Exception as e:
-            st.warning(f"Failed to log to Google Sheets: {e}")
-            return False
 
+    def _open_worksheet(self):
+        import gspread
+        from google.oauth2.service_account import Credentials
+
+        # Get credentials from Streamlit secrets
+        creds_dict = st.secrets["gcp_service_account"]
+
+        scopes = [
+            "https://www.googleapis.com/auth/spreadsheets",
+            "https://www.googleapis.com/auth/drive"
+        ]
+        credentials = Credentials.from_service_account_info(creds_dict, scopes=scopes)
+        client = gspread.authorize(credentials)
+
+        spreadsheet = client.open_by_key(self.spreadsheet_id)
+
+        try:
+            return spreadsheet.worksheet(self.worksheet_name)
+        except gspread.exceptions.WorksheetNotFound:
+            worksheet = spreadsheet.add_worksheet(self.worksheet_name, rows=100, cols=10)
+            worksheet.append_row(LOG_HEADER)
+            return worksheet
@@ -0,0 +1,228 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+import config
+
+# ============================================================
+# HISTOGRAMS AND COUNTERS
+# ============================================================
+# Latencies go into fixed log-spaced buckets (20% apart, 50us to ~2min), so
+# recording is a bisect and an increment and percentiles are read off the
+# cumulative counts with at most one bucket of error. Past the last bucket
+# the largest observed value is reported instead.
+
+BUCKET_BOUNDS = []
+_bound = 50e-6
+while _bound < 120:
+    BUCKET_BOUNDS.append(_bound)
+    _bound *= 1.2
+del _bound
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        bucket = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        # Consistent (counts, count, sum, max), safe against concurrent observe
+        with self._lock:
+            return list(self.counts), self.count, self.sum, self.max
+
+    def percentile(self, p):
+        counts, count, _, maximum = self.snapshot()
+        return _percentile(counts, count, maximum, p)
+
+    def summary(self):
+        # Every field comes from the same snapshot
+        counts, count, total, maximum = self.snapshot()
+        return {
+            'count': count,
+            'sum': total,
+            'p50': _percentile(counts, count, maximum, 50),
+            'p95': _percentile(counts, count, maximum, 95),
+            'p99': _percentile(counts, count, maximum, 99),
+        }
+
+
+def _percentile(counts, count, maximum, p):
+    if not count:
+        return 0.0
+    rank = p / 100 * count
+    seen = 0
+    for bucket, bucket_count in enumerate(counts):
+        seen += bucket_count
+        if seen >= rank and bucket_count:
+            if bucket == len(BUCKET_BOUNDS):
+                return maximum
+            # Geometric midpoint of the bucket
+            return BUCKET_BOUNDS[bucket] / 1.2 ** 0.5
+    return maximum
+
+
+class Span:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=None):
+        self.enabled = config.METRICS_ENABLED if enabled is None else enabled
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def span(self, name):
+        # with metrics.span("classify.embedding"): ...
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self.histogram(name))
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            self.histogram(name).observe(seconds)
+
+    def increment(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+
+def span(name):
+    return REGISTRY.span(name)
+
+
+def observe(name, seconds):
+    REGISTRY.observe(name, seconds)
+
+
+def increment(name, value=1, **labels):
+    REGISTRY.increment(name, value, **labels)
+
+
+# ============================================================
+# EXPORT SINKS
+# ============================================================
+# A sink turns a registry into something a collector can read.
+
+def _metric_name(name):
+    return "tutor_" + name.replace('.', '_').replace('-', '_')
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class PrometheusTextSink:
+    # Prometheus text exposition format, served at /metrics by server.py
+    content_type = "text/plain; version=0.0.4"
+
+    def export(self, registry=None):
+        registry = registry or REGISTRY
+        lines = []
+        for name, histogram in sorted(registry.histograms.items()):
+            metric = _metric_name(name) + "_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            # One snapshot, so +Inf is never below the last cumulative bucket
+            counts, count, total, _ = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKET_BOUNDS, counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {count}')
+            lines.append(f"{metric}_sum {total:.9g}")
+            lines.append(f"{metric}_count {count}")
+
+        counter_names = sorted({name for name, _ in registry.counters})
+        for name in counter_names:
+            metric = _metric_name(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, labels), value in sorted(registry.counters.items()):
+                if counter_name == name:
+                    lines.append(f"{metric}{_label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class JsonSink:
+    # Histogram summaries (count, sum, p50/p95/p99 in seconds) and counters;
+    # written atomically when a path is given
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+
+    def export(self, registry=None):
+        registry = registry or REGISTRY
+        snapshot = {
+            'timestamp': time.time(),
+            'histograms': {name: h.summary() for name, h in sorted(registry.histograms.items())},
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(registry.counters.items())
+            ],
+        }
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.path.with_suffix(".tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, indent=2)
+            os.replace(tmp_file, self.path)
+        return snapshot
+
+
+def export_on_exit(sink, registry=None):
+    atexit.register(sink.export, registry or REGISTRY)
@@ -1,15 +1,22 @@
-from transformers import AutoTokenizer, AutoModel
+import threading
+from pathlib import Path
+import numpy as np
 import config
 
 # Global model cache
 _embedding_model = None
 _embedding_tokenizer = None
+_embedding_engines = {}
+_engine_lock = threading.Lock()
+_warmup_thread = None
 
 
 def get_embedding_model():
     global _embedding_model, _embedding_tokenizer
     
     if _embedding_model is None:
+        # torch and transformers are imported on first use, not at startup
+        from transformers import AutoTokenizer, AutoModel
         _embedding_tokenizer = AutoTokenizer.from_pretrained(
             config.EMBEDDING_MODEL
         )
@@ -19,3 +26,169 @@ def get_embedding_model():
         _embedding_model.eval()
     
     return _embedding_model, _embedding_tokenizer
+
+
+# ============================================================
+# EMBEDDING ENGINES
+# ============================================================
+# An engine turns a batch of texts into mean-pooled (N, d) float32
+# embeddings. Both engines share the tokenizer and pooling semantics.
+
+def mean_pooling(model_output, attention_mask):
+    import torch
+    token_embeddings = model_output[0]
+    input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
+    return torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1), min=1e-9)
+
+
+def mean_pooling_numpy(token_embeddings, attention_mask):
+    mask = attention_mask[..., None].astype(np.float32)
+    return (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+class TorchEmbeddingEngine:
+    name = "torch"
+
+    def __init__(self):
+        self.model, self.tokenizer = get_embedding_model()
+        self.hidden_size = self.model.config.hidden_size
+
+    def encode(self, texts):
+        import torch
+        inputs = self.tokenizer(
+            texts,
+            return_tensors="pt",
+            truncation=True,
+            max_length=config.EMBEDDING_MAX_LENGTH,
+            padding=True
+        )
+
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+
+        return mean_pooling(outputs, inputs['attention_mask']).numpy()
+
+
+class OnnxEmbeddingEngine:
+    # Same network exported to ONNX and quantized to int8 weights; runs on
+    # ONNX Runtime without touching torch once the export exists on disk
+    name = "onnx-int8"
+
+    def __init__(self, model_dir=None):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir or config.ONNX_MODEL_PATH)
+        model_file = model_dir / "model-int8.onnx"
+        if not model_file.exists():
+            export_onnx_model(model_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(config.EMBEDDING_MODEL)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(str(model_file), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.hidden_size = self.session.get_outputs()[0].shape[-1]
+
+    def encode(self, texts):
+        inputs = self.tokenizer(
+            texts,
+            return_tensors="np",
+            truncation=True,
+            max_length=config.EMBEDDING_MAX_LENGTH,
+            padding=True
+        )
+        feed = {name: inputs[name].astype(np.int64) for name in self.input_names}
+        token_embeddings = self.session.run(None, feed)[0]
+        return mean_pooling_numpy(token_embeddings, inputs['attention_mask']).astype(np.float32)
+
+
+def export_onnx_model(model_dir=None):
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    model_dir = Path(model_dir or config.ONNX_MODEL_PATH)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    fp32_file = model_dir / "model.onnx"
+    int8_file = model_dir / "model-int8.onnx"
+
+    print(f"Exporting {config.EMBEDDING_MODEL} to ONNX...")
+    model, tokenizer = get_embedding_model()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            str(fp32_file),
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=17
+        )
+
+    # Dynamic quantization: int8 weights, activations quantized per batch at runtime
+    tmp_file = model_dir / "model-int8.onnx.tmp"
+    quantize_dynamic(str(fp32_file), str(tmp_file), weight_type=QuantType.QInt8)
+    tmp_file.replace(int8_file)
+    print(f"✓ Quantized model saved to {int8_file}\n")
+    return int8_file
+
+
+EMBEDDING_ENGINES = {
+    "torch": TorchEmbeddingEngine,
+    "onnx": OnnxEmbeddingEngine,
+}
+
+
+def get_embedding_engine(engine=None):
+    engine = engine or config.EMBEDDING_ENGINE
+    if engine not in _embedding_engines:
+        if engine not in EMBEDDING_ENGINES:
+            raise ValueError(f"Unknown embedding engine: {engine}")
+        # A question arriving during warm-up waits for that load instead of starting another
+        with _engine_lock:
+            if engine not in _embedding_engines:
+                _embedding_engines[engine] = EMBEDDING_ENGINES[engine]()
+    return _embedding_engines[engine]
+
+
+def warm_embedding_engine(engine=None):
+    # Load the engine and run one forward pass on a background thread, so
+    # the first question does not pay for imports and model loading
+    global _warmup_thread
+
+    def warm():
+        try:
+            get_embedding_engine(engine).encode(["warm up"])
+        except Exception as e:
+            print(f"⚠️ Embedding model warm-up failed: {e}")
+
+    with _engine_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warm, name="embedding-warmup", daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
+
+
+def embedding_engine_ready(engine=None):
+    return (engine or config.EMBEDDING_ENGINE) in _embedding_engines
+
+
+def embedding_engine_uncased(engine=None):
+    # Whether the engine's tokenizer lowercases its input, in which case
+    # questions differing only in case embed identically
+    tokenizer = get_embedding_engine(engine).tokenizer
+    do_lower_case = getattr(tokenizer, 'do_lower_case', None)
+    if do_lower_case is None:
+        do_lower_case = tokenizer.init_kwargs.get('do_lower_case', False)
+    return bool(do_lower_case)
+
+
+def embedding_engine_id(engine=None):
+    # Identifies the numbers an engine produces, e.g. for embedding cache keys
+    engine = engine or config.EMBEDDING_ENGINE
+    return EMBEDDING_ENGINES[engine].name
@@ -1,9 +1,13 @@
+import hashlib
+import json
+import os
 import re
 import string
+from functools import lru_cache
+from pathlib import Path
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer, ENGLISH_STOP_WORDS
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 import config
+from references import extract_example_numbers
 
 
 # ============================================================
@@ -31,64 +35,68 @@ def preprocess_text(text):
 # LECTURE CHUNKING
 # ============================================================
 
-def chunk_lectures_by_section(lecture_texts, chunk_size=None):
-    if chunk_size is None:
-        chunk_size = config.CHUNK_SIZE
+SECTION_PATTERN = re.compile(r'(\\subsection\{[^}]+\}|\\section\{[^}]+\})')
+QUESTION_PATTERN = re.compile(r'\\(?:sub)?section\*\{Question\s+(\d+)\}')
+PART_PATTERN = re.compile(r'\\item\s*\[\(?([a-z]|[ivxlcdm]+)\)?\]', re.IGNORECASE)
 
-    all_chunks = []
-    
-    for lecture_name, text in lecture_texts.items():
-        section_pattern = r'(\\subsection\{[^}]+\}|\\section\{[^}]+\})'
-        sections = re.split(section_pattern, text)
-        
-        current_section_title = "Preamble"
-        current_content = ""
-        chunk_index = 0
-        
-        for part in sections:
-            if re.match(section_pattern, part):
-                # Save previous chunk
-                if current_content.strip():
-                    all_chunks.append({
-                        'chunk_id': f"{lecture_name}_{chunk_index}",
-                        'document_name': lecture_name,
-                        'document_type': 'lecture',
-                        'chunk_index': chunk_index,
-                        'section_title': current_section_title,
-                        'text': current_content.strip(),
-                        'char_length': len(current_content)
-                    })
-                    chunk_index += 1
-                
-                current_section_title = part
-                current_content = ""
-            else:
-                current_content += part
-        
-        # Save last chunk
-        if current_content.strip():
-            all_chunks.append({
-                'chunk_id': f"{lecture_name}_{chunk_index}",
-                'document_name': lecture_name,
-                'document_type': 'lecture',
-                'chunk_index': chunk_index,
-                'section_title': current_section_title,
-                'text': current_content.strip(),
-                'char_length': len(current_content)
-            })
-    
-    # Split large chunks
-    splitter = RecursiveCharacterTextSplitter(
+
+@lru_cache(maxsize=None)
+def get_splitter(chunk_size, chunk_overlap):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
-        chunk_overlap=config.CHUNK_OVERLAP,
+        chunk_overlap=chunk_overlap,
         separators=["\n\n", "$$", "\n", ". ", " "]
     )
-    
+
+
+def _lecture_chunk(lecture_name, chunk_index, section_title, content):
+    return {
+        'chunk_id': f"{lecture_name}_{chunk_index}",
+        'document_name': lecture_name,
+        'document_type': 'lecture',
+        'chunk_index': chunk_index,
+        'section_title': section_title,
+        'text': content.strip(),
+        'char_length': len(content),
+        'examples': extract_example_numbers(section_title + "\n" + content)
+    }
+
+
+def chunk_lecture(lecture_name, text, chunk_size=None):
+    # One lecture: split on (sub)section headers, then split oversized sections
+    if chunk_size is None:
+        chunk_size = config.CHUNK_SIZE
+
+    section_chunks = []
+    current_section_title = "Preamble"
+    current_parts = []
+    chunk_index = 0
+
+    for part in SECTION_PATTERN.split(text):
+        if SECTION_PATTERN.match(part):
+            # Save previous chunk
+            content = "".join(current_parts)
+            if content.strip():
+                section_chunks.append(_lecture_chunk(lecture_name, chunk_index, current_section_title, content))
+                chunk_index += 1
+
+            current_section_title = part
+            current_parts = []
+        else:
+            current_parts.append(part)
+
+    # Save last chunk
+    content = "".join(current_parts)
+    if content.strip():
+        section_chunks.append(_lecture_chunk(lecture_name, chunk_index, current_section_title, content))
+
+    # Split large chunks
+    splitter = get_splitter(chunk_size, config.CHUNK_OVERLAP)
     final_chunks = []
-    for chunk in all_chunks:
+    for chunk in section_chunks:
         if chunk['char_length'] > chunk_size:
-            sub_chunks = splitter.split_text(chunk['text'])
-            for j, sub_chunk in enumerate(sub_chunks):
+            for j, sub_chunk in enumerate(splitter.split_text(chunk['text'])):
                 final_chunks.append({
                     'chunk_id': f"{chunk['chunk_id']}_sub{j}",
                     'document_name': chunk['document_name'],
@@ -96,58 +104,54 @@ def chunk_lectures_by_section(lecture_texts, chunk_size=None):
                     'chunk_index': chunk['chunk_index'],
                     'section_title': chunk['section_title'],
                     'text': sub_chunk,
-                    'char_length': len(sub_chunk)
+                    'char_length': len(sub_chunk),
+                    'examples': extract_example_numbers(chunk['section_title'] + "\n" + sub_chunk)
                 })
         else:
             final_chunks.append(chunk)
-    
+
     return final_chunks
 
 
-def chunk_exercises_by_question(exercise_texts, chunk_size=None):
+def chunk_lectures_by_section(lecture_texts, chunk_size=None):
+    return [chunk for lecture_name, text in lecture_texts.items()
+            for chunk in chunk_lecture(lecture_name, text, chunk_size)]
+
+
+# ============================================================
+# EXERCISE CHUNKING
+# ============================================================
+
+def chunk_exercise(exercise_name, text, chunk_size=None):
+    # One exercise sheet: one chunk per question, oversized questions split
     if chunk_size is None:
         chunk_size = config.CHUNK_SIZE
 
-    all_chunks = []
-    
-    for exercise_name, text in exercise_texts.items():
-        # Split by questions
-        question_pattern = r'\\(?:sub)?section\*\{Question\s+(\d+)\}'
-        questions = re.split(question_pattern, text)
-        
-        for i in range(1, len(questions), 2):
-            if i + 1 < len(questions):
-                question_num = questions[i]
-                question_content = questions[i + 1]
-                
-                # Extract part labels
-                part_pattern = r'\\item\s*\[\(?([a-z]|[ivxlcdm]+)\)?\]'
-                parts = re.findall(part_pattern, question_content, re.IGNORECASE)
-                
-                chunk = {
-                    'chunk_id': f"{exercise_name}_Q{question_num}",
-                    'document_name': exercise_name,
-                    'document_type': 'exercise',
-                    'question_num': int(question_num),
-                    'section_title': f"Question {question_num}",
-                    'text': question_content.strip(),
-                    'char_length': len(question_content),
-                    'parts': parts
-                }
-                all_chunks.append(chunk)
-    
-    # Split large chunks
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=0,
-        separators=["\n\n", "$$", "\n", ". ", " "]
-    )
-    
+    splitter = get_splitter(chunk_size, 0)
+    questions = QUESTION_PATTERN.split(text)
     final_chunks = []
-    for chunk in all_chunks:
+
+    for i in range(1, len(questions) - 1, 2):
+        question_num = questions[i]
+        question_content = questions[i + 1]
+
+        # Extract part labels
+        parts = PART_PATTERN.findall(question_content)
+
+        chunk = {
+            'chunk_id': f"{exercise_name}_Q{question_num}",
+            'document_name': exercise_name,
+            'document_type': 'exercise',
+            'question_num': int(question_num),
+            'section_title': f"Question {question_num}",
+            'text': question_content.strip(),
+            'char_length': len(question_content),
+            'parts': parts
+        }
+
+        # Split large chunks
         if chunk['char_length'] > chunk_size:
-            sub_chunks = splitter.split_text(chunk['text'])
-            for j, sub_chunk in enumerate(sub_chunks):
+            for j, sub_chunk in enumerate(splitter.split_text(chunk['text'])):
                 final_chunks.append({
                     'chunk_id': f"{chunk['chunk_id']}_sub{j}",
                     'document_name': chunk['document_name'],
@@ -160,17 +164,30 @@ def chunk_exercises_by_question(exercise_texts, chunk_size=None):
                 })
         else:
             final_chunks.append(chunk)
-    
+
     return final_chunks
 
 
+def chunk_exercises_by_question(exercise_texts, chunk_size=None):
+    return [chunk for exercise_name, text in exercise_texts.items()
+            for chunk in chunk_exercise(exercise_name, text, chunk_size)]
+
+
 # ============================================================
 # KEYWORD EXTRACTION
 # ============================================================
 
+@lru_cache(maxsize=None)
+def get_stop_words():
+    # Importing scikit-learn takes over a second; only pay for it when needed
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return ENGLISH_STOP_WORDS
+
+
 def extract_keywords(text, score_threshold=0.025, min_length=3):
+    from sklearn.feature_extraction.text import TfidfVectorizer
     vectorizer = TfidfVectorizer(
-        stop_words=list(ENGLISH_STOP_WORDS),
+        stop_words=list(get_stop_words()),
         min_df=1, max_df=1, ngram_range=(1, 3),
         lowercase=True
     )
@@ -190,19 +207,101 @@ def extract_keywords(text, score_threshold=0.025, min_length=3):
     return sorted(keywords_with_scores, key=lambda x: x[1], reverse=True)
 
 
-def build_master_keywords(texts):
-    master_keywords = set()
+def _noise_mask(feature_names, min_length):
+    # Vocabulary-wide versions of the per-word checks in extract_keywords
+    mask = np.char.str_len(feature_names) < min_length
+    mask |= np.isin(feature_names, list(config.MATH_NOISE))
+
+    present = set(''.join(feature_names))
+    noisy_chars = {char for char in present
+                   if char.isdigit() or char in config.GREEK_CHARS or char == '_'}
+    for char in noisy_chars:
+        mask |= np.char.find(feature_names, char) >= 0
+    return mask
+
+
+def _keywords_cache_key(texts, score_threshold, min_length):
+    digest = hashlib.sha256()
+    digest.update(json.dumps([score_threshold, min_length,
+                              sorted(config.MATH_NOISE), sorted(config.GREEK_CHARS)]).encode('utf-8'))
     for text in texts:
-        master_keywords.update(word for word, _ in extract_keywords(text))
+        digest.update(hashlib.sha256(text.encode('utf-8')).digest())
+    return digest.hexdigest()
+
+
+def extract_corpus_keywords(texts, score_threshold=0.025, min_length=3):
+    # One fit over the corpus. With a single document the TF-IDF idf is 1, so
+    # per-document extract_keywords scores a term by its L2-normalised count in
+    # that document; the same scores are read off the rows of one sparse count
+    # matrix. The result equals the union of extract_keywords over all texts,
+    # up to float rounding for terms scoring within ~1e-15 of the threshold.
+    from scipy import sparse
+    from sklearn.feature_extraction.text import CountVectorizer
+    vectorizer = CountVectorizer(
+        stop_words=list(get_stop_words()),
+        ngram_range=(1, 3),
+        lowercase=True
+    )
+
+    counts = vectorizer.fit_transform(texts).astype(np.float64)
+    row_norms = np.sqrt(np.asarray(counts.multiply(counts).sum(axis=1)).ravel())
+    scores = sparse.diags(1.0 / np.maximum(row_norms, 1e-12)) @ counts
+    best_scores = scores.max(axis=0).toarray().ravel()
+
+    feature_names = vectorizer.get_feature_names_out().astype(str)
+    keep = (best_scores >= score_threshold) & ~_noise_mask(feature_names, min_length)
+    return set(feature_names[keep].tolist())
+
+
+def build_master_keywords(texts, score_threshold=0.025, min_length=3, index_path=None):
+    texts = list(texts)
+    cache_file = Path(index_path or config.INDEX_PATH) / "keywords.json"
+    cache_key = _keywords_cache_key(texts, score_threshold, min_length)
+
+    # Reuse the keywords persisted next to the embedding index when the corpus is unchanged
+    if cache_file.exists():
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('key') == cache_key:
+                print(f"✓ Loaded keywords from {cache_file.name}")
+                return frozenset(cached['keywords'])
+        except (OSError, ValueError):
+            pass
+
+    master_keywords = extract_corpus_keywords(texts, score_threshold, min_length)
     print(f"✓ Completed processing keywords from all lectures")
-    return sorted(master_keywords)
+
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_suffix(".tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'key': cache_key, 'keywords': sorted(master_keywords)}, f)
+    os.replace(tmp_file, cache_file)
+
+    return frozenset(master_keywords)
+
+
+# Same tokenisation the keyword vectorizer used to build 2- and 3-grams
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+
+def question_keyword_candidates(question_lower):
+    stop_words = get_stop_words()
+    words = {word.strip(string.punctuation) for word in question_lower.split()}
+    candidates = {w for w in words if w not in stop_words}
+
+    tokens = [token for token in TOKEN_PATTERN.findall(question_lower) if token not in stop_words]
+    for n in (2, 3):
+        candidates.update(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    return candidates
 
 
 def filter_question(question, master_keywords, min_keywords=2):
+    # master_keywords is a frozenset, so each candidate is an O(1) lookup
     question_lower = question.lower()
-    words = {word.strip(string.punctuation) for word in question_lower.split()}
+    candidates = question_keyword_candidates(question_lower)
     
-    keywords_found = [w for w in words if w in master_keywords and w not in ENGLISH_STOP_WORDS]
+    keywords_found = [w for w in candidates if w in master_keywords]
     is_relevant = len(keywords_found) >= min_keywords
     
     return is_relevant, keywords_found, len(keywords_found)
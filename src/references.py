@@ -1,30 +1,69 @@
 import re
 
+# ============================================================
+# COMPILED PATTERNS
+# ============================================================
+# Compiled once at import; every question runs all of them
+
+LECTURE_PATTERNS = [
+    (re.compile(r'lecture[s]?\s+(\d+)\s*-\s*(\d+)', re.IGNORECASE), 'range'),      # lecture 1-5
+    (re.compile(r'lecture[s]?\s+(\d+)\s+(?:and|&)\s+(\d+)', re.IGNORECASE), 'range'),  # lecture 1 and 2
+    (re.compile(r'lecture[s]?\s+(\d+)\s+to\s+(\d+)', re.IGNORECASE), 'range'),      # lecture 1 to 5
+    (re.compile(r'lecture\s+(\d+)', re.IGNORECASE), 'single'),                      # lecture 3
+    (re.compile(r'from\s+lecture\s+(\d+)', re.IGNORECASE), 'single'),               # from lecture 5
+]
+LECTURE_EXAMPLE_PATTERN = re.compile(r'lecture[s]?\s+(\d+)\s+example[s]?\s+(\d+)(?:\([a-z]\))?', re.IGNORECASE)
+EXAMPLE_LECTURE_PATTERN = re.compile(r'example[s]?\s+(\d+).*?lecture[s]?\s+(\d+)', re.IGNORECASE)
+
+WEEK_PATTERNS = [
+    (re.compile(r'week\s+(\d+)\s*-\s*(\d+)', re.IGNORECASE), 'range'),              # week 1-3
+    (re.compile(r'week[s]?\s+(\d+)\s+(?:and|&)\s+(\d+)', re.IGNORECASE), 'range'),  # week 1 and 2
+    (re.compile(r'week\s+(\d+)\s+to\s+(\d+)', re.IGNORECASE), 'range'),             # week 1 to 3
+    (re.compile(r'week\s+(\d+)', re.IGNORECASE), 'single'),                         # week 5
+]
+WEEK_EXAMPLE_PATTERN = re.compile(r'week[s]?\s+(\d+)\s+example[s]?\s+(\d+)', re.IGNORECASE)
+EXAMPLE_WEEK_PATTERN = re.compile(r'example[s]?\s+(\d+).*?week[s]?\s+(\d+)', re.IGNORECASE)
+
+_EXERCISE = r'(?:exercise[s]?\s+sheet|exercise[s]?|ex\s+sheet|ex)'
+_PARENS = re.compile(r'[()]')
+
+EXERCISE_PATTERNS = [
+    (re.compile(_EXERCISE + r'\s+(\d+)\s+(?:question|q)\s*(\d+)\s+part\s+([a-z]|\d+\(?[a-z]\)?|[ivxlcdm]+)', re.IGNORECASE), lambda m: (int(m[0]), int(m[1]), m[2].lower())),
+    (re.compile(r'(?:question|q)\s*(\d+)\s+part\s+([a-z]|\d+\(?[a-z]\)?|[ivxlcdm]+)\s+in\s+' + _EXERCISE + r'\s+(\d+)', re.IGNORECASE), lambda m: (int(m[2]), int(m[0]), m[1].lower())),
+    (re.compile(_EXERCISE + r'\s+(\d+)\s+(?:question|q)\s*(\d+)([a-z]|\(\d*[a-z]\)|\d+\([a-z]\))', re.IGNORECASE), lambda m: (int(m[0]), int(m[1]), _PARENS.sub('', m[2].lower()))),
+    (re.compile(r'(?:question|q)\s*(\d+)([a-z]|\(\d*[a-z]\)|\d+\([a-z]\))\s+in\s+' + _EXERCISE + r'\s+(\d+)', re.IGNORECASE), lambda m: (int(m[2]), int(m[0]), _PARENS.sub('', m[1].lower()))),
+    (re.compile(_EXERCISE + r'\s+(\d+)\s+(?:question|q)\s*(\d+)(?!\s*[a-z(])', re.IGNORECASE), lambda m: (int(m[0]), int(m[1]), None)),
+    (re.compile(r'(?:question|q)\s*(\d+)\s+in\s+' + _EXERCISE + r'\s+(\d+)(?!\s*(?:part|[a-z(]))', re.IGNORECASE), lambda m: (int(m[1]), int(m[0]), None)),
+    (re.compile(_EXERCISE + r'\s+(\d+)\s+(\d+)([a-z]|\([a-z]\))', re.IGNORECASE), lambda m: (int(m[0]), int(m[1]), _PARENS.sub('', m[2].lower()))),
+    (re.compile(r'ex\.?\s*(\d+)\s*(?:q|question)\.?\s*(\d+)([a-z]|\(\d*[a-z]\)|\d+\([a-z]\))?', re.IGNORECASE), lambda m: (int(m[0]), int(m[1]), _PARENS.sub('', m[2].lower()) if m[2] else None)),
+    (re.compile(r'ex\.?\s+sheet\s+(\d+)\s+(?:question|q)\s*(\d+)([a-z]|\(\d*[a-z]\)|\d+\([a-z]\))?', re.IGNORECASE), lambda m: (int(m[0]), int(m[1]), _PARENS.sub('', m[2].lower()) if m[2] else None)),
+]
+EXERCISE_ONLY_PATTERN = re.compile(_EXERCISE + r'\s+(\d+)(?!\s+(?:question|q))', re.IGNORECASE)
+
+LECTURE_DOCUMENT_PATTERN = re.compile(r'lecture\s+(\d+)\s*(?:-\s*(\d+))?\.txt')
+EXERCISE_DOCUMENT_PATTERN = re.compile(r'exercise\s+(\d+)')
+CHUNK_EXAMPLE_PATTERN = re.compile(r'\bexample\s+(\d+)\b', re.IGNORECASE)
+
+
+# ============================================================
+# REFERENCE EXTRACTION
+# ============================================================
+
 def extract_lecture_references(question):
     lectures = set()
     
-    lecture_patterns = [
-        (r'lecture[s]?\s+(\d+)\s*-\s*(\d+)', 'range'),      # lecture 1-5
-        (r'lecture[s]?\s+(\d+)\s+(?:and|&)\s+(\d+)', 'range'),  # lecture 1 and 2
-        (r'lecture[s]?\s+(\d+)\s+to\s+(\d+)', 'range'),      # lecture 1 to 5
-        (r'lecture\s+(\d+)', 'single'),                      # lecture 3
-        (r'from\s+lecture\s+(\d+)', 'single'),               # from lecture 5
-    ]
-    
-    lecture_example_pattern = r'lecture[s]?\s+(\d+)\s+example[s]?\s+(\d+)(?:\([a-z]\))?'
-    matches = re.findall(lecture_example_pattern, question, re.IGNORECASE)
+    matches = LECTURE_EXAMPLE_PATTERN.findall(question)
     matched_lecture_nums = set()
     for lecture_num, example_num in matches:
         lectures.add((int(lecture_num), int(example_num)))
         matched_lecture_nums.add(int(lecture_num))
 
-    example_lecture_pattern = r'example[s]?\s+(\d+).*?lecture[s]?\s+(\d+)'
-    matches = re.findall(example_lecture_pattern, question, re.IGNORECASE)
+    matches = EXAMPLE_LECTURE_PATTERN.findall(question)
     for example_num, lecture_num in matches:
         lectures.add((int(lecture_num), int(example_num)))
 
-    for pattern, match_type in lecture_patterns:
-        matches = re.findall(pattern, question, re.IGNORECASE)
+    for pattern, match_type in LECTURE_PATTERNS:
+        matches = pattern.findall(question)
         for match in matches:
             if match_type == 'range':
                 start, end = int(match[0]), int(match[1])
@@ -40,26 +79,17 @@ def extract_lecture_references(question):
 
 def extract_week_references(question):
     weeks = set()
-    
-    week_patterns = [
-        (r'week\s+(\d+)\s*-\s*(\d+)', 'range'),              # week 1-3
-        (r'week[s]?\s+(\d+)\s+(?:and|&)\s+(\d+)', 'range'),  # week 1 and 2
-        (r'week\s+(\d+)\s+to\s+(\d+)', 'range'),             # week 1 to 3
-        (r'week\s+(\d+)', 'single'),                         # week 5
-    ]
-
-    week_example_pattern = r'week[s]?\s+(\d+)\s+example[s]?\s+(\d+)'
-    matches = re.findall(week_example_pattern, question, re.IGNORECASE)
+
+    matches = WEEK_EXAMPLE_PATTERN.findall(question)
     for week_num, example_num in matches:
         weeks.add((int(week_num), int(example_num)))
     
-    example_week_pattern = r'example[s]?\s+(\d+).*?week[s]?\s+(\d+)'
-    matches = re.findall(example_week_pattern, question, re.IGNORECASE)
+    matches = EXAMPLE_WEEK_PATTERN.findall(question)
     for example_num, week_num in matches:
         weeks.add((int(week_num), int(example_num)))
     
-    for pattern, match_type in week_patterns:
-        matches = re.findall(pattern, question, re.IGNORECASE)
+    for pattern, match_type in WEEK_PATTERNS:
+        matches = pattern.findall(question)
         for match in matches:
             if match_type == 'range':
                 start, end = int(match[0]), int(match[1])
@@ -76,20 +106,8 @@ def extract_exercise_references(question):
     """Extract exercise references"""
     result = {'exercises': set(), 'exercise_parts': {}}
     
-    patterns = [
-        (r'(?:exercise[s]?\s+sheet|exercise[s]?|ex\s+sheet|ex)\s+(\d+)\s+(?:question|q)\s*(\d+)\s+part\s+([a-z]|\d+\(?[a-z]\)?|[ivxlcdm]+)', lambda m: (int(m[0]), int(m[1]), m[2].lower())),
-        (r'(?:question|q)\s*(\d+)\s+part\s+([a-z]|\d+\(?[a-z]\)?|[ivxlcdm]+)\s+in\s+(?:exercise[s]?\s+sheet|exercise[s]?|ex\s+sheet|ex)\s+(\d+)', lambda m: (int(m[2]), int(m[0]), m[1].lower())),
-        (r'(?:exercise[s]?\s+sheet|exercise[s]?|ex\s+sheet|ex)\s+(\d+)\s+(?:question|q)\s*(\d+)([a-z]|\(\d*[a-z]\)|\d+\([a-z]\))', lambda m: (int(m[0]), int(m[1]), re.sub(r'[()]', '', m[2].lower()))),
-        (r'(?:question|q)\s*(\d+)([a-z]|\(\d*[a-z]\)|\d+\([a-z]\))\s+in\s+(?:exercise[s]?\s+sheet|exercise[s]?|ex\s+sheet|ex)\s+(\d+)', lambda m: (int(m[2]), int(m[0]), re.sub(r'[()]', '', m[1].lower()))),
-        (r'(?:exercise[s]?\s+sheet|exercise[s]?|ex\s+sheet|ex)\s+(\d+)\s+(?:question|q)\s*(\d+)(?!\s*[a-z(])', lambda m: (int(m[0]), int(m[1]), None)),
-        (r'(?:question|q)\s*(\d+)\s+in\s+(?:exercise[s]?\s+sheet|exercise[s]?|ex\s+sheet|ex)\s+(\d+)(?!\s*(?:part|[a-z(]))', lambda m: (int(m[1]), int(m[0]), None)),
-        (r'(?:exercise[s]?\s+sheet|exercise[s]?|ex\s+sheet|ex)\s+(\d+)\s+(\d+)([a-z]|\([a-z]\))', lambda m: (int(m[0]), int(m[1]), re.sub(r'[()]', '', m[2].lower()))),
-        (r'ex\.?\s*(\d+)\s*(?:q|question)\.?\s*(\d+)([a-z]|\(\d*[a-z]\)|\d+\([a-z]\))?', lambda m: (int(m[0]), int(m[1]), re.sub(r'[()]', '', m[2].lower()) if m[2] else None)),
-        (r'ex\.?\s+sheet\s+(\d+)\s+(?:question|q)\s*(\d+)([a-z]|\(\d*[a-z]\)|\d+\([a-z]\))?', lambda m: (int(m[0]), int(m[1]), re.sub(r'[()]', '', m[2].lower()) if m[2] else None)),
-    ]
-    
-    for pattern, parser in patterns:
-        for match in re.findall(pattern, question, re.IGNORECASE):
+    for pattern, parser in EXERCISE_PATTERNS:
+        for match in pattern.findall(question):
             ex_num, q_num, part = parser(match)
             result['exercises'].add(ex_num)
             key = (ex_num, q_num)
@@ -98,7 +116,7 @@ def extract_exercise_references(question):
             if part:
                 result['exercise_parts'][key].add(part)
     
-    for ex_num in re.findall(r'(?:exercise[s]?\s+sheet|exercise[s]?|ex\s+sheet|ex)\s+(\d+)(?!\s+(?:question|q))', question, re.IGNORECASE):
+    for ex_num in EXERCISE_ONLY_PATTERN.findall(question):
         result['exercises'].add(int(ex_num))
     
     return result
@@ -113,76 +131,87 @@ def extract_document_references(question):
     }
 
 
-def match_references_to_chunks(references, chunks_with_embeddings):
+# ============================================================
+# REFERENCE MATCHING
+# ============================================================
+
+def extract_example_numbers(text):
+    # Whole-token match, so "example 2" is not found inside "example 21"
+    return sorted({int(number) for number in CHUNK_EXAMPLE_PATTERN.findall(text)})
+
+
+def build_reference_index(chunks_with_embeddings):
+    """Precompute lookups from lecture/exercise numbers to chunk ids"""
+    index = {
+        'positions': {},
+        'lectures': {},
+        'lecture_examples': {},
+        'exercises': {},
+        'exercise_questions': {},
+        'parts': {}
+    }
+
+    for position, chunk in enumerate(chunks_with_embeddings):
+        chunk_id = chunk['chunk_id']
+        index['positions'][chunk_id] = position
+
+        if chunk['document_type'] == 'lecture':
+            match = LECTURE_DOCUMENT_PATTERN.search(chunk['document_name'].lower())
+            if match:
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else start
+                examples = chunk.get('examples')
+                if examples is None:
+                    examples = extract_example_numbers(chunk['text'])
+                for lecture_num in range(start, end + 1):
+                    index['lectures'].setdefault(lecture_num, []).append(chunk_id)
+                    for example_num in examples:
+                        index['lecture_examples'].setdefault((lecture_num, example_num), []).append(chunk_id)
+
+        elif chunk['document_type'] == 'exercise':
+            match = EXERCISE_DOCUMENT_PATTERN.search(chunk['document_name'].lower())
+            if match:
+                exercise_num = int(match.group(1))
+                index['exercises'].setdefault(exercise_num, []).append(chunk_id)
+                index['exercise_questions'].setdefault((exercise_num, chunk.get('question_num')), []).append(chunk_id)
+                index['parts'][chunk_id] = set(chunk.get('parts', []))
+
+    return index
+
+
+def match_references_to_chunks(references, chunks_with_embeddings, reference_index=None):
+    if reference_index is None:
+        reference_index = build_reference_index(chunks_with_embeddings)
+
     matched_chunk_ids = set()
     
-    # Match lectures
-    for lecture_num, example_num in references['lectures']:
-        for chunk in chunks_with_embeddings:
-            if chunk['document_type'] == 'lecture':
-                doc_name_lower = chunk['document_name'].lower()
-                match = re.search(r'lecture\s+(\d+)\s*(?:-\s*(\d+))?\.txt', doc_name_lower)
-                if match:
-                    start = int(match.group(1))
-                    end = int(match.group(2)) if match.group(2) else start
-                    if start <= lecture_num <= end:
-                        if example_num:
-                            if f'example {example_num}' in chunk['text'].lower():
-                                matched_chunk_ids.add(chunk['chunk_id'])
-                        else:
-                            matched_chunk_ids.add(chunk['chunk_id'])
-    
-    # Match weeks (same logic)
-    for week_num, example_num in references['weeks']:
-        for chunk in chunks_with_embeddings:
-            if chunk['document_type'] == 'lecture':
-                doc_name_lower = chunk['document_name'].lower()
-                match = re.search(r'lecture\s+(\d+)\s*(?:-\s*(\d+))?\.txt', doc_name_lower)
-                if match:
-                    start = int(match.group(1))
-                    end = int(match.group(2)) if match.group(2) else start
-                    if start <= week_num <= end:
-                        if example_num:
-                            if f'example {example_num}' in chunk['text'].lower():
-                                matched_chunk_ids.add(chunk['chunk_id'])
-                        else:
-                            matched_chunk_ids.add(chunk['chunk_id'])
+    # Match lectures and weeks (weeks map onto lecture numbers)
+    for lecture_num, example_num in references['lectures'] | references['weeks']:
+        if example_num:
+            matched_chunk_ids.update(reference_index['lecture_examples'].get((lecture_num, example_num), ()))
+        else:
+            matched_chunk_ids.update(reference_index['lectures'].get(lecture_num, ()))
     
     # Match exercises
-    for chunk in chunks_with_embeddings:
-        if chunk['document_type'] == 'exercise':
-            exercise_match = re.search(r'exercise\s+(\d+)', chunk['document_name'].lower())
-            if exercise_match:
-                exercise_num = int(exercise_match.group(1))
-                
-                if exercise_num in references['exercises']:
-                    if references['exercise_parts']:
-                        for (ref_ex, ref_q), parts in references['exercise_parts'].items():
-                            if ref_ex == exercise_num:
-                                if ref_q is None:
-                                    # Part of whole exercise
-                                    if parts:
-                                        chunk_parts = set(chunk.get('parts', []))
-                                        if chunk_parts and parts.intersection(chunk_parts):
-                                            matched_chunk_ids.add(chunk['chunk_id'])
-                                        elif not chunk_parts:
-                                            matched_chunk_ids.add(chunk['chunk_id'])
-                                    else:
-                                        matched_chunk_ids.add(chunk['chunk_id'])
-                                else:
-                                    # Specific question
-                                    if chunk.get('question_num') == ref_q:
-                                        if parts:
-                                            chunk_parts = set(chunk.get('parts', []))
-                                            if chunk_parts:
-                                                if parts.intersection(chunk_parts):
-                                                    matched_chunk_ids.add(chunk['chunk_id'])
-                                            else:
-                                                matched_chunk_ids.add(chunk['chunk_id'])
-                                        else:
-                                            matched_chunk_ids.add(chunk['chunk_id'])
-                    else:
-                        # All chunks from this exercise
-                        matched_chunk_ids.add(chunk['chunk_id'])
+    for exercise_num in references['exercises']:
+        if not references['exercise_parts']:
+            # All chunks from this exercise
+            matched_chunk_ids.update(reference_index['exercises'].get(exercise_num, ()))
+            continue
+
+        for (ref_ex, ref_q), parts in references['exercise_parts'].items():
+            if ref_ex != exercise_num:
+                continue
+            if ref_q is None:
+                # Part of whole exercise
+                candidates = reference_index['exercises'].get(exercise_num, ())
+            else:
+                # Specific question
+                candidates = reference_index['exercise_questions'].get((exercise_num, ref_q), ())
+
+            for chunk_id in candidates:
+                chunk_parts = reference_index['parts'][chunk_id]
+                if not parts or not chunk_parts or parts.intersection(chunk_parts):
+                    matched_chunk_ids.add(chunk_id)
     
     return matched_chunk_ids
@@ -0,0 +1,291 @@
+import json
+import os
+from pathlib import Path
+import numpy as np
+import config
+
+# ============================================================
+# RETRIEVAL BACKENDS
+# ============================================================
+# A backend scores a unit-length query against the row-normalised chunk
+# embeddings and returns (chunk positions, cosine similarities), best first.
+
+def top_k_order(values, top_k=None):
+    # np.argsort(-values, kind='stable')[:top_k], but only the winners are
+    # sorted; ties at the cut keep the earliest positions, as a stable sort would
+    if top_k is None or top_k >= len(values):
+        return np.argsort(-values, kind='stable')
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    kth = np.partition(values, len(values) - top_k)[len(values) - top_k]
+    above = np.flatnonzero(values > kth)
+    winners = np.concatenate([above, np.flatnonzero(values == kth)[:top_k - len(above)]])
+    winners.sort()
+    return winners[np.argsort(-values[winners], kind='stable')]
+
+
+def rank_similarities(scores, similarity_threshold, top_k=None):
+    # (top_k best positions, number of positions that cleared the threshold)
+    candidates = np.flatnonzero(scores >= similarity_threshold)
+    return candidates[top_k_order(scores[candidates], top_k)], len(candidates)
+
+
+def rank_of(values, targets):
+    # Position each targets[i] (an index into values) would take in
+    # np.argsort(-values, kind='stable'), found by counting rather than
+    # sorting values: O(len(values) * log(len(targets)))
+    levels = np.unique(values[targets])
+    below = np.searchsorted(levels, values, 'left')
+    tied = np.flatnonzero(np.searchsorted(levels, values, 'right') > below)
+    # Values strictly above each level, then earlier positions with an equal value
+    above = len(values) - np.cumsum(np.bincount(below, minlength=len(levels)))[:len(levels)]
+    codes = below[tied]
+    order = np.argsort(codes, kind='stable')
+    ahead = np.empty(len(tied), dtype=np.int64)
+    ahead[order] = np.arange(len(tied)) - np.searchsorted(codes[order], codes[order], 'left')
+    ranks = above[codes] + ahead
+    return ranks[np.searchsorted(tied, targets)]
+
+
+class ExactSearchBackend:
+    name = "exact"
+    # Scores every chunk, so anything it leaves out is below the threshold
+    exhaustive = True
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def search(self, query, similarity_threshold=0.0, top_k=None):
+        return self.search_with_count(query, similarity_threshold, top_k)[:2]
+
+    def search_with_count(self, query, similarity_threshold=0.0, top_k=None):
+        scores = self.matrix @ query
+        indices, num_candidates = rank_similarities(scores, similarity_threshold, top_k)
+        return indices, scores[indices], num_candidates
+
+    def candidates(self, query, similarity_threshold=0.0):
+        # Every position that clears the threshold, unsorted, in the order
+        # search_with_count breaks ties in
+        scores = self.matrix @ query
+        indices = np.flatnonzero(scores >= similarity_threshold)
+        return indices, scores[indices]
+
+    def score(self, query, indices):
+        return self.matrix[indices] @ query
+
+
+class IVFBackend:
+    # Inverted-file index: vectors are clustered with spherical k-means and
+    # stored grouped by cluster, so a query only scores the nprobe closest
+    # lists. Every array is a plain .npy file and is memory-mapped on load.
+    name = "ivf"
+    exhaustive = False
+    FILES = ('centroids', 'vectors', 'ids', 'offsets')
+
+    def __init__(self, centroids, vectors, ids, offsets, nprobe=None, fingerprint=None):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.offsets = offsets
+        self.nprobe = nprobe or config.IVF_NPROBE
+        self.fingerprint = fingerprint
+        # Chunk position -> row in the cluster-ordered vectors
+        self._rows = None
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @classmethod
+    def build(cls, matrix, nlist=None, iterations=10, train_size=None, seed=0, fingerprint=None):
+        n = matrix.shape[0]
+        nlist = min(nlist or config.IVF_NLIST or max(1, int(4 * np.sqrt(n))), n)
+        train_size = min(train_size or 64 * nlist, n)
+        rng = np.random.default_rng(seed)
+
+        sample = matrix[np.sort(rng.choice(n, train_size, replace=False))]
+        centroids = sample[rng.choice(train_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = _assign(sample, centroids)
+            counts = np.bincount(assignment, minlength=nlist)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            nonempty = counts > 0
+            sums = np.zeros_like(centroids)
+            sums[nonempty] = np.add.reduceat(sample[np.argsort(assignment, kind='stable')],
+                                             starts[nonempty], axis=0)
+            # Re-seed empty clusters from random training vectors
+            sums[~nonempty] = sample[rng.choice(train_size, int((~nonempty).sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        assignment = _assign(matrix, centroids)
+        ids = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=offsets[1:])
+        vectors = np.ascontiguousarray(matrix[ids], dtype=np.float32)
+        return cls(centroids.astype(np.float32), vectors, ids.astype(np.int64), offsets,
+                   fingerprint=fingerprint)
+
+    def save(self, index_path):
+        index_path = Path(index_path)
+        index_path.mkdir(parents=True, exist_ok=True)
+        for name in self.FILES:
+            tmp_file = index_path / f"{name}.npy.tmp"
+            with open(tmp_file, 'wb') as f:
+                np.save(f, getattr(self, name))
+            os.replace(tmp_file, index_path / f"{name}.npy")
+        with open(index_path / "ivf_meta.json", 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint, 'count': len(self)}, f)
+
+    @classmethod
+    def load(cls, index_path, fingerprint=None, nprobe=None):
+        index_path = Path(index_path)
+        try:
+            with open(index_path / "ivf_meta.json", 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if fingerprint is not None and meta['fingerprint'] != fingerprint:
+                return None
+            arrays = {name: np.load(index_path / f"{name}.npy", mmap_mode='r') for name in cls.FILES}
+        except (OSError, ValueError, KeyError):
+            return None
+        if arrays['vectors'].shape[0] != meta['count']:
+            return None
+        return cls(**arrays, nprobe=nprobe, fingerprint=meta['fingerprint'])
+
+    def _candidates(self, query, nprobe):
+        centroid_scores = self.centroids @ query
+        nprobe = min(nprobe, len(centroid_scores))
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes])
+
+    def search(self, query, similarity_threshold=0.0, top_k=None, nprobe=None):
+        return self.search_with_count(query, similarity_threshold, top_k, nprobe)[:2]
+
+    def search_with_count(self, query, similarity_threshold=0.0, top_k=None, nprobe=None):
+        rows = self._candidates(query, nprobe or self.nprobe)
+        rows.sort()
+        scores = self.vectors[rows] @ query
+        order, num_candidates = rank_similarities(scores, similarity_threshold, top_k)
+        return self.ids[rows[order]], scores[order], num_candidates
+
+    def candidates(self, query, similarity_threshold=0.0, nprobe=None):
+        rows = self._candidates(query, nprobe or self.nprobe)
+        rows.sort()
+        scores = self.vectors[rows] @ query
+        keep = np.flatnonzero(scores >= similarity_threshold)
+        return self.ids[rows[keep]], scores[keep]
+
+    def score(self, query, indices):
+        if self._rows is None:
+            rows = np.empty(len(self.ids), dtype=np.int64)
+            rows[self.ids] = np.arange(len(self.ids))
+            self._rows = rows
+        return self.vectors[self._rows[indices]] @ query
+
+
+def _assign(vectors, centroids, block_size=65536):
+    assignment = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], block_size):
+        block = np.asarray(vectors[start:start + block_size])
+        assignment[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+def build_retrieval_backend(matrix, fingerprint=None, backend=None, index_path=None):
+    backend = backend or config.RETRIEVAL_BACKEND
+    if backend == "exact" or len(matrix) == 0:
+        return ExactSearchBackend(matrix)
+    if backend == "ivf":
+        index_path = index_path or config.IVF_INDEX_PATH
+        ivf = IVFBackend.load(index_path, fingerprint=fingerprint)
+        if ivf is None:
+            ivf = IVFBackend.build(matrix, fingerprint=fingerprint)
+            ivf.save(index_path)
+        return ivf
+    raise ValueError(f"Unknown retrieval backend: {backend}")
+
+
+# ============================================================
+# HYBRID (LEXICAL + DENSE) FUSION
+# ============================================================
+
+def hybrid_search(backend, query, lexical_scores, similarity_threshold=0.0, fusion=None, top_k=None):
+    # Dense results re-ranked together with BM25 scores. Returned similarities
+    # stay dense cosine scores, so thresholds and confidence are unchanged.
+    # Returns the top_k (indices, similarities), the number of candidates and
+    # the best dense similarity among all of them, which fusion may rank lower.
+    fusion = config.HYBRID_FUSION if fusion is None else fusion
+    lexical_hits = np.flatnonzero(lexical_scores > 0)
+    if not fusion or not len(lexical_hits):
+        indices, similarities, num_candidates = backend.search_with_count(query, similarity_threshold, top_k)
+        return indices, similarities, num_candidates, float(similarities[0]) if len(indices) else 0.0
+
+    if fusion not in ("rrf", "weighted"):
+        raise ValueError(f"Unknown hybrid fusion: {fusion}")
+
+    # Every dense candidate, in the order the backend breaks ties in
+    indices, similarities = backend.candidates(query, similarity_threshold)
+    num_dense = len(indices)
+    returned = np.zeros(len(lexical_scores), dtype=bool)
+    returned[indices] = True
+
+    # Lexical matches the dense backend did not score (e.g. outside the IVF probes)
+    missing = lexical_hits[~returned[lexical_hits]]
+    if len(missing) and not backend.exhaustive:
+        extra = backend.score(query, missing)
+        keep = extra >= similarity_threshold
+        indices = np.concatenate([indices, missing[keep]])
+        similarities = np.concatenate([similarities, extra[keep]])
+    top_similarity = float(similarities.max()) if len(similarities) else 0.0
+    is_hit = lexical_scores[indices] > 0
+
+    # Only a few candidates can make the fused top_k; just those are ranked
+    if top_k is None:
+        top, others = top_k_order(similarities), np.empty(0, dtype=np.int64)
+    elif fusion == "rrf":
+        # Outside the dense and the lexical top `depth` a chunk fuses to at
+        # most 2 / (k + depth + 1), below the 1 / (k + top_k) each of the
+        # dense top_k reaches
+        depth = int(config.RRF_K) + 2 * top_k
+        top = top_k_order(similarities, depth)
+        in_lexical_top = np.zeros(len(lexical_scores), dtype=bool)
+        in_lexical_top[lexical_hits[top_k_order(lexical_scores[lexical_hits], depth)]] = True
+        others = np.flatnonzero(in_lexical_top[indices])
+    else:
+        # Without a lexical hit the fused score falls with the dense rank,
+        # while the dense weight is not negative
+        top = top_k_order(similarities, top_k if config.HYBRID_LEXICAL_WEIGHT <= 1 else None)
+        others = np.flatnonzero(is_hit)
+    selected, first = np.unique(np.concatenate([top, others]), return_index=True)
+    dense_rank = np.concatenate([np.arange(len(top)), rank_of(similarities, others)])[first]
+    # Equal fused scores go to backend results by dense rank, then to the
+    # lexical matches the backend missed, in position order
+    appended = selected >= num_dense
+    tiebreak = np.lexsort((np.where(appended, selected, dense_rank), appended))
+    selected, dense_rank = selected[tiebreak], dense_rank[tiebreak]
+
+    if fusion == "rrf":
+        selected_hits = is_hit[selected]
+        ranks = np.full(len(selected), -1, dtype=np.int64)
+        ranks[selected_hits] = rank_of(lexical_scores[lexical_hits],
+                                       np.searchsorted(lexical_hits, indices[selected[selected_hits]]))
+        fused = 1.0 / (config.RRF_K + dense_rank + 1)
+        fused += np.where(ranks >= 0, 1.0 / (config.RRF_K + ranks + 1), 0.0)
+    else:
+        lexical = lexical_scores[indices[selected]] / lexical_scores[lexical_hits].max()
+        weight = config.HYBRID_LEXICAL_WEIGHT
+        fused = (1 - weight) * similarities[selected] + weight * lexical
+
+    order = selected[top_k_order(fused, top_k)]
+    return indices[order], similarities[order], len(indices), top_similarity
+
+
+def recall_at_k(backend, exact_backend, queries, k=10):
+    # Fraction of the exact top-k that the backend also returns in its top-k
+    hits = 0
+    for query in queries:
+        expected, _ = exact_backend.search(query, -1.0, top_k=k)
+        found, _ = backend.search(query, -1.0, top_k=k)
+        hits += len(np.intersect1d(expected, found))
+    return hits / (k * len(queries)) if len(queries) else 0.0
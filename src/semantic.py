@@ -1,89 +1,295 @@
-import torch
-from sklearn.metrics.pairwise import cosine_similarity
-from models import get_embedding_model
+import asyncio
+import re
+import threading
+import weakref
+from collections import OrderedDict
+import numpy as np
+from models import get_embedding_engine, embedding_engine_id, embedding_engine_ready, embedding_engine_uncased
 import config
-from references import match_references_to_chunks, extract_document_references
+from references import match_references_to_chunks, extract_document_references, build_reference_index
+from retrieval import ExactSearchBackend, hybrid_search
+from bm25 import BM25Index
+from chunk_store import ChunkStore, RetrievedChunk, RetrievalResults
 
 # ============================================================
 # EMBEDDING GENERATION
 # ============================================================
 
-def mean_pooling(model_output, attention_mask):
-    token_embeddings = model_output[0]
-    input_mask_expanded = attention_mask.unsqueeze(-1).expand(token_embeddings.size()).float()
-    return torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1), min=1e-9)
+def get_embeddings(texts, batch_size=None):
+    if batch_size is None:
+        batch_size = config.EMBEDDING_BATCH_SIZE
+
+    engine = get_embedding_engine()
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, engine.hidden_size), dtype=np.float32)
+
+    # Sort by token length so each batch pads to a similar length
+    lengths = [len(ids) for ids in engine.tokenizer(
+        texts,
+        truncation=True,
+        max_length=config.EMBEDDING_MAX_LENGTH
+    )['input_ids']]
+    order = np.argsort(lengths, kind='stable')
+
+    embeddings = np.empty((len(texts), engine.hidden_size), dtype=np.float32)
+    for start in range(0, len(texts), batch_size):
+        batch_ids = order[start:start + batch_size]
+        embeddings[batch_ids] = engine.encode([texts[i] for i in batch_ids])
+
+    return embeddings
 
 
 def get_embedding(text):
-    model, tokenizer = get_embedding_model()
-    
-    inputs = tokenizer(
-        text, 
-        return_tensors="pt", 
-        truncation=True, 
-        max_length=config.EMBEDDING_MAX_LENGTH, 
-        padding=True
-    )
-    
-    with torch.no_grad():
-        outputs = model(**inputs)
-    
-    embedding = mean_pooling(outputs, inputs['attention_mask'])
-    return embedding[0].numpy()
+    return get_query_embeddings([text])[0]
 
 
-def generate_chunk_embeddings(chunks):
+def generate_chunk_embeddings(chunks, batch_size=None):
     print(f"Generating embeddings for {len(chunks)} chunks...")
-    for i, chunk in enumerate(chunks):
-        chunk['embedding'] = get_embedding(chunk['text'])
-        if (i + 1) % 10 == 0:
-            print(f"  Processed {i + 1}/{len(chunks)} chunks...")
+    embeddings = get_embeddings([chunk['text'] for chunk in chunks], batch_size=batch_size)
+    for chunk, embedding in zip(chunks, embeddings):
+        chunk['embedding'] = embedding
     print(f"✓ Completed\n")
     return chunks
 
 
+# ============================================================
+# QUERY EMBEDDING CACHE
+# ============================================================
+
+def normalize_query_text(text):
+    # Only changes the tokenizer ignores: runs of whitespace, and case when
+    # the tokenizer lowercases
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text.lower() if embedding_engine_uncased() else text
+
+
+class QueryEmbeddingCache:
+    # Bounded LRU of question embeddings. Stored vectors are read-only, so a
+    # caller writing into one gets an error instead of corrupting the cache.
+    def __init__(self, max_size=None):
+        self.max_size = max_size if max_size is not None else config.QUERY_EMBEDDING_CACHE_SIZE
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text):
+        return (config.EMBEDDING_MODEL, embedding_engine_id(), config.EMBEDDING_MAX_LENGTH,
+                normalize_query_text(text))
+
+    def get(self, key, count_miss=True):
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, key, embedding):
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        if self.max_size <= 0:
+            return embedding
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return embedding
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+QUERY_EMBEDDING_CACHE = QueryEmbeddingCache()
+
+
+def get_query_embeddings(texts):
+    # Question embeddings through the cache; misses share one batched pass
+    texts = list(texts)
+    keys = [QUERY_EMBEDDING_CACHE.key(text) for text in texts]
+    found = [QUERY_EMBEDDING_CACHE.get(key) for key in keys]
+
+    missing = {}
+    for key, text, embedding in zip(keys, texts, found):
+        if embedding is None:
+            missing.setdefault(key, text)
+    if missing:
+        computed = get_embeddings(list(missing.values()))
+        computed = {key: QUERY_EMBEDDING_CACHE.put(key, embedding)
+                    for key, embedding in zip(missing, computed)}
+        found = [embedding if embedding is not None else computed[key] for key, embedding in zip(keys, found)]
+
+    if not found:
+        return np.empty((0, 0), dtype=np.float32)
+    embeddings = np.vstack(found)
+    embeddings.setflags(write=False)
+    return embeddings
+
+
+# ============================================================
+# MICRO-BATCHED QUERY EMBEDDING
+# ============================================================
+
+class EmbeddingBatcher:
+    # Questions arriving within a few milliseconds of each other share one
+    # forward pass. A batch is flushed when the window closes or it is full.
+    def __init__(self, executor=None, window_ms=None, max_batch=None):
+        self.executor = executor
+        self.window = (config.EMBEDDING_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_batch = max_batch or config.EMBEDDING_BATCH_SIZE
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.texts = 0
+
+    async def embed(self, text):
+        # Cached questions skip the batching window entirely. Nothing is
+        # cached before the engine loads, and building a key would load it
+        # on the event loop. A miss is counted when the batch looks it up.
+        if embedding_engine_ready():
+            cached = QUERY_EMBEDDING_CACHE.get(QUERY_EMBEDDING_CACHE.key(text), count_miss=False)
+            if cached is not None:
+                return cached
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush(loop)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush, loop)
+        return await future
+
+    def _flush(self, loop):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        self.batches += 1
+        self.texts += len(batch)
+        work = loop.run_in_executor(self.executor, get_query_embeddings, [text for text, _ in batch])
+
+        def distribute(work):
+            error = work.exception()
+            for i, (_, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(work.result()[i])
+
+        work.add_done_callback(distribute)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'texts': self.texts,
+            'mean_batch_size': self.texts / self.batches if self.batches else 0.0
+        }
+
+
 # ============================================================
 # SEMANTIC SIMILARITY FILTERING
 # ============================================================
 
+def build_embedding_matrix(chunks_with_embeddings):
+    # Row-normalised (N, d) matrix so cosine similarity is a single dot product
+    if isinstance(chunks_with_embeddings, ChunkStore) and chunks_with_embeddings.embeddings is not None:
+        return chunks_with_embeddings.embeddings
+    if not len(chunks_with_embeddings):
+        return np.empty((0, 0), dtype=np.float32)
+    matrix = np.vstack([chunk['embedding'] for chunk in chunks_with_embeddings]).astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+# Indexes built for callers that pass only a store, kept for the store's lifetime
+_STORE_DEFAULTS = weakref.WeakKeyDictionary()
 
-def get_relevant_chunks(question, chunks_with_embeddings, similarity_threshold=0.50):
-    # Extract references
+
+def _store_default(store, name, build):
+    defaults = _STORE_DEFAULTS.setdefault(store, {})
+    if name not in defaults:
+        defaults[name] = build()
+    return defaults[name]
+
+
+def find_referenced_chunks(question, chunks_with_embeddings, reference_index=None):
+    if reference_index is None:
+        if isinstance(chunks_with_embeddings, ChunkStore):
+            reference_index = _store_default(chunks_with_embeddings, 'references',
+                                             lambda: build_reference_index(chunks_with_embeddings))
+        else:
+            reference_index = build_reference_index(chunks_with_embeddings)
     references = extract_document_references(question)
-    referenced_chunk_ids = match_references_to_chunks(references, chunks_with_embeddings)
-    
-    # Get question embedding
-    question_embedding = get_embedding(question)
-    
-    # Calculate similarity
-    relevant_chunks = []
+    return match_references_to_chunks(references, chunks_with_embeddings, reference_index)
+
+
+def get_relevant_chunks(question, chunks_with_embeddings, similarity_threshold=0.50, retrieval_backend=None,
+                        question_embedding=None, reference_index=None, lexical_index=None,
+                        referenced_chunk_ids=None, top_k=None):
+    # Results are RetrievedChunk views into the chunk store; nothing is copied per chunk.
+    # With top_k only the best top_k are materialised; the returned
+    # RetrievalResults still counts every candidate.
+    if not isinstance(chunks_with_embeddings, ChunkStore):
+        # Converting per query would re-encode the whole corpus every time
+        raise TypeError("get_relevant_chunks needs a ChunkStore; build one once with ChunkStore.from_chunks")
+    if retrieval_backend is None:
+        retrieval_backend = _store_default(chunks_with_embeddings, 'backend', lambda: ExactSearchBackend(
+            build_embedding_matrix(chunks_with_embeddings)))
+    if lexical_index is None and config.HYBRID_FUSION:
+        lexical_index = _store_default(chunks_with_embeddings, 'lexical',
+                                       lambda: BM25Index.build(chunks_with_embeddings.texts()))
+    if reference_index is None:
+        reference_index = _store_default(chunks_with_embeddings, 'references',
+                                         lambda: build_reference_index(chunks_with_embeddings))
+
+    # Extract references, unless the caller already matched them
+    if referenced_chunk_ids is None:
+        referenced_chunk_ids = find_referenced_chunks(question, chunks_with_embeddings, reference_index)
     
     if referenced_chunk_ids:
         # If references exist, search only those and give them 1.0 similarity
-        for chunk in chunks_with_embeddings:
-            if chunk['chunk_id'] in referenced_chunk_ids:
-                relevant_chunks.append({
-                    'chunk_id': chunk['chunk_id'],
-                    'document_name': chunk['document_name'],
-                    'lecture': chunk.get('lecture', chunk.get('document_name', '')),
-                    'chunk_index': chunk.get('chunk_index', 0),
-                    'similarity_score': 1.0,
-                    'text': chunk['text'],
-                    'from_reference': True
-                })
+        positions = sorted(reference_index['positions'][chunk_id] for chunk_id in referenced_chunk_ids)
+        return RetrievalResults([RetrievedChunk(chunks_with_embeddings, i, 1.0, True) for i in positions[:top_k]],
+                                num_candidates=len(positions), top_similarity=1.0)
+
+    if not len(chunks_with_embeddings):
+        return RetrievalResults()
+
+    # No references: score chunks through the retrieval backend, fused with BM25
+    if question_embedding is None:
+        question_embedding = get_embedding(question)
+    query = (question_embedding / max(np.linalg.norm(question_embedding), 1e-12)).astype(np.float32)
+    if lexical_index is not None and config.HYBRID_FUSION:
+        indices, similarities, num_candidates, top_similarity = hybrid_search(
+            retrieval_backend, query, lexical_index.scores(question), similarity_threshold, top_k=top_k)
     else:
-        # No references: search all chunks
-        for chunk in chunks_with_embeddings:
-            similarity = cosine_similarity([question_embedding], [chunk['embedding']])[0][0]
-            if similarity >= similarity_threshold:
-                relevant_chunks.append({
-                    'chunk_id': chunk['chunk_id'],
-                    'document_name': chunk['document_name'],
-                    'lecture': chunk.get('lecture', chunk.get('document_name', '')),
-                    'chunk_index': chunk.get('chunk_index', 0),
-                    'similarity_score': float(similarity),
-                    'text': chunk['text'],
-                    'from_reference': False
-                })
-    
-    return sorted(relevant_chunks, key=lambda x: x['similarity_score'], reverse=True)
+        indices, similarities, num_candidates = retrieval_backend.search_with_count(query, similarity_threshold,
+                                                                                    top_k)
+        top_similarity = float(similarities[0]) if len(indices) else 0.0
+
+    return RetrievalResults(
+        [RetrievedChunk(chunks_with_embeddings, int(i), similarity, False)
+         for i, similarity in zip(indices, np.asarray(similarities, dtype=np.float64).tolist())],
+        num_candidates=num_candidates, top_similarity=top_similarity)
@@ -0,0 +1,231 @@
+# ============================================================
+# HEADLESS HTTP SERVER
+# ============================================================
+# ASGI service around CourseTutor:
+#   uvicorn server:app --app-dir src --host 0.0.0.0 --port 8000
+#
+# POST /classify  {"question": ...}                                 -> classification JSON
+# POST /answer    {"question": ..., "compare_without_context": bool} -> answer JSON
+# POST /stream    {"question": ...}                                 -> server-sent events
+# GET  /health                                                      -> readiness and cache stats
+# GET  /metrics[?format=json]                                       -> stage latencies and counters
+
+import asyncio
+import json
+from course_tutor import CourseTutor
+from models import warm_embedding_engine, embedding_engine_ready
+from metrics import PrometheusTextSink, JsonSink
+from semantic import QUERY_EMBEDDING_CACHE
+
+_tutor = None
+_startup_error = None
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ============================================================
+# RESPONSE PAYLOADS
+# ============================================================
+
+def classification_payload(result):
+    semantic = result['semantic_results'] or {}
+    return {
+        'question': result['question'],
+        'classification': result['classification'],
+        'stage': result['stage'],
+        'confidence': result['confidence'],
+        'admin_exam_keywords': result['admin_exam_keywords'],
+        'keywords_found': semantic.get('keywords_found', []),
+        'similarity_score': semantic.get('similarity_score'),
+        'num_relevant_chunks': semantic.get('num_relevant_chunks', 0),
+        'top_chunks': [
+            {
+                'chunk_id': chunk['chunk_id'],
+                'lecture': chunk['lecture'],
+                'similarity_score': chunk['similarity_score'],
+                'from_reference': chunk['from_reference']
+            }
+            for chunk in semantic.get('relevant_chunks', [])[:5]
+        ]
+    }
+
+
+def answer_payload(result):
+    # Everything except the (already consumed or absent) stream
+    return {key: value for key, value in result.items() if key != 'response_stream'}
+
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+# ============================================================
+# ENDPOINTS
+# ============================================================
+
+async def classify(body, send):
+    result = await _tutor.aclassify_question(body['question'])
+    await send_json(send, 200, classification_payload(result))
+
+
+async def answer(body, send):
+    result = await _tutor.aprocess_question(
+        body['question'],
+        compare_without_context=bool(body.get('compare_without_context', False))
+    )
+    await send_json(send, 200, answer_payload(result))
+
+
+async def stream(body, send):
+    result = await _tutor.aprocess_question(body['question'], stream=True)
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache')]
+    })
+
+    # Metadata first, so clients can render the classification before tokens arrive
+    meta = answer_payload(result)
+    del meta['response']
+    await send({'type': 'http.response.body', 'body': sse_event(meta, 'meta'), 'more_body': True})
+
+    if result.get('response_stream') is not None:
+        async for token in result['response_stream']:
+            await send({'type': 'http.response.body', 'body': sse_event({'token': token}), 'more_body': True})
+    else:
+        await send({'type': 'http.response.body', 'body': sse_event({'token': result['response']}),
+                    'more_body': True})
+
+    await send({'type': 'http.response.body', 'body': sse_event({}, 'done')})
+
+
+async def health(send):
+    # 503 until the tutor has loaded, so readiness probes hold traffic back
+    status = 'ok' if _tutor is not None else 'failed' if _startup_error else 'starting'
+    await send_json(send, 200 if _tutor is not None else 503, {
+        'status': status,
+        'error': _startup_error,
+        'embedding_model_ready': embedding_engine_ready(),
+        'embedding_batches': _tutor.embedding_batcher.stats() if _tutor else None,
+        'query_embedding_cache': QUERY_EMBEDDING_CACHE.stats(),
+        'answer_cache': _tutor.answer_cache.stats() if _tutor else None
+    })
+
+
+async def export_metrics(scope, send):
+    if b'format=json' in scope.get('query_string', b''):
+        await send_json(send, 200, JsonSink().export())
+        return
+    body = PrometheusTextSink().export().encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', PrometheusTextSink.content_type.encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+ROUTES = {
+    '/classify': classify,
+    '/answer': answer,
+    '/stream': stream,
+}
+
+
+# ============================================================
+# ASGI PLUMBING
+# ============================================================
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def read_json(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    try:
+        body = json.loads(b''.join(chunks) or b'{}')
+    except ValueError:
+        raise HTTPError(400, "Request body must be JSON")
+    if not isinstance(body, dict) or 'question' not in body:
+        raise HTTPError(400, "Missing 'question'")
+    if not isinstance(body['question'], str) or not body['question'].strip():
+        raise HTTPError(400, "'question' must be a non-empty string")
+    return body
+
+
+async def load_tutor():
+    global _tutor, _startup_error
+    try:
+        # Corpus loading is blocking; the model warms up alongside it
+        warm_embedding_engine()
+        _tutor = await asyncio.get_running_loop().run_in_executor(None, CourseTutor)
+    except Exception as e:
+        _startup_error = str(e)
+        print(f"⚠️ Course tutor failed to start: {e}")
+
+
+async def lifespan(receive, send):
+    loading = None
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Accept connections straight away; /health reports progress and
+            # the endpoints answer 503 until the tutor is loaded
+            loading = asyncio.ensure_future(load_tutor())
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if loading is not None and not loading.done():
+                loading.cancel()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    path, method = scope['path'], scope['method']
+    try:
+        if path == '/health' and method == 'GET':
+            await health(send)
+            return
+        if path == '/metrics' and method == 'GET':
+            await export_metrics(scope, send)
+            return
+        if path not in ROUTES:
+            raise HTTPError(404, "Not found")
+        if method != 'POST':
+            raise HTTPError(405, "Method not allowed")
+        if _tutor is None:
+            raise HTTPError(503, f"Course tutor failed to start: {_startup_error}" if _startup_error
+                            else "Course tutor is still starting")
+        await ROUTES[path](await read_json(receive), send)
+    except HTTPError as e:
+        await send_json(send, e.status, {'error': e.message})
+
+
+if __name__ == "__main__":
+    import uvicorn
+    import config
+
+    uvicorn.run(app, host=config.SERVER_HOST, port=config.SERVER_PORT)
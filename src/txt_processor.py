@@ -2,16 +2,19 @@ from pathlib import Path
 import config
 
 
+def read_text_file(txt_file):
+    with open(txt_file, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
 def load_lecture_texts(path_lectures):
     lecture_texts = {}
     for txt_file in sorted(Path(path_lectures).glob('*.txt')):
-        with open(txt_file, 'r', encoding='utf-8') as f:
-            lecture_texts[txt_file.name] = f.read()
+        lecture_texts[txt_file.name] = read_text_file(txt_file)
     return lecture_texts
 
 def load_exercise_texts(path_exercises):
     exercise_texts = {}
     for txt_file in sorted(Path(path_exercises).glob('*.txt')):
-        with open(txt_file, 'r', encoding='utf-8') as f:
-            exercise_texts[txt_file.name] = f.read()
+        exercise_texts[txt_file.name] = read_text_file(txt_file)
     return exercise_texts
\ No newline at end of file